@@ -8,42 +8,197 @@ Claude 3.5 Sonnet and S3 Vectors.
 
 Features:
 - Modern, responsive web interface
-- Real-time question processing
+- Real-time question processing with streamed answers (Server-Sent Events)
 - Structured answer display with sources
-- Chat history and conversation memory
+- Chat history and conversation memory (server-side sessions in Redis)
 - Mobile-friendly design
 - Error handling and loading states
 
 Usage:
-    python3 app.py
+    Development:
+        python3 app.py
+    Production (gevent workers, see gunicorn_conf.py):
+        gunicorn -c gunicorn_conf.py app:app
     Then open http://localhost:5000 in your browser
 """
 
-from flask import Flask, render_template, request, jsonify, session
+from flask import Flask, Response, render_template, request, jsonify, session, stream_with_context
 from flask_cors import CORS
-import json
+from flask_session import Session
+import orjson
 import boto3
+import hashlib
+import redis
 import logging
+import queue
+import threading
 from typing import List, Dict, Any
-from datetime import datetime
 import uuid
 import os
 
 # Import our RAG system
-from aws_docs_rag_system import AWSDocsRAGSystem
+from aws_docs_rag_system import AWSDocsRAGSystem, configure_logging, iso_now
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging (queue-based, off the request path)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # For session management
+# For session management; signed session IDs must verify in every Gunicorn worker,
+# so a per-process random key would reject sessions started in another worker
+app.secret_key = os.environ.get('FLASK_SECRET_KEY')
+if not app.secret_key:
+    raise RuntimeError("FLASK_SECRET_KEY must be set to a secret shared by all workers")
+
+# Keep sessions in Redis; only the session ID rides in the cookie
+redis_client = redis.Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+app.config.update(
+    SESSION_TYPE='redis',
+    SESSION_REDIS=redis_client,
+    SESSION_USE_SIGNER=True,
+    SESSION_PERMANENT=False
+)
+Session(app)
 CORS(app)  # Enable CORS for API calls
 
 # Global RAG system instance
 rag_system = None
 
+# Example questions are static: serialize them once and let clients cache them
+EXAMPLE_QUESTIONS = [
+    {
+        'category': 'Compute & Serverless',
+        'questions': [
+            'How do I scale Lambda functions automatically?',
+            'What are the best practices for Lambda memory optimization?',
+            'When should I use EC2 vs Lambda for my workload?',
+            'How to implement auto-scaling for EC2 instances?'
+        ]
+    },
+    {
+        'category': 'Storage & Databases',
+        'questions': [
+            'What are the best security practices for S3 buckets?',
+            'How to optimize DynamoDB read and write performance?',
+            'What are the different S3 storage classes and when to use them?',
+            'How to implement RDS backup and recovery strategies?'
+        ]
+    },
+    {
+        'category': 'Networking & Security',
+        'questions': [
+            'How to configure VPC security groups vs NACLs?',
+            'What are IAM policy best practices?',
+            'How to implement AWS security monitoring?',
+            'What are the Route 53 DNS routing policies?'
+        ]
+    },
+    {
+        'category': 'Architecture & Best Practices',
+        'questions': [
+            'What are the AWS Well-Architected Framework principles?',
+            'How to implement cost optimization strategies?',
+            'What are the best practices for multi-region deployments?',
+            'How to design fault-tolerant AWS architectures?'
+        ]
+    }
+]
+
+EXAMPLES_PAYLOAD = orjson.dumps({'success': True, 'data': EXAMPLE_QUESTIONS})
+EXAMPLES_ETAG = '"' + hashlib.md5(EXAMPLES_PAYLOAD).hexdigest() + '"'
+EXAMPLES_HEADERS = {'ETag': EXAMPLES_ETAG, 'Cache-Control': 'public, max-age=86400'}
+
+# Bounds on per-session state
+MAX_CHAT_HISTORY = 20
+SESSION_PREVIEW_CHARS = 400
+SOURCES_TTL_SECONDS = 24 * 60 * 60
+HISTORY_TTL_SECONDS = 60 * 60
+
+class ChatHistoryStore:
+    """Per-session chat history kept in Redis lists and written behind.
+
+    Redis is the only copy, so every Gunicorn worker reads the same history.
+    Writes are built as pipelines and queued for a daemon thread to execute,
+    so no Redis write sits on the request path. Each append is RPUSH, LTRIM
+    and EXPIRE, so workers never overwrite each other's entries.
+    """
+    
+    def __init__(self, redis_client, max_entries: int, ttl_seconds: int):
+        self.redis_client = redis_client
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._queue = queue.Queue()
+        threading.Thread(target=self._flush_loop, name='chat-history-writer', daemon=True).start()
+    
+    def _key(self, session_id: str) -> str:
+        return f"chat_history:{session_id}"
+    
+    def get(self, session_id: str) -> List[Dict[str, Any]]:
+        return [orjson.loads(entry) for entry in self.redis_client.lrange(self._key(session_id), 0, -1)]
+    
+    def append(self, session_id: str, entry: Dict[str, Any], sources_key: str, sources: List[Dict[str, Any]],
+               sources_ttl_seconds: int):
+        """Queue an entry, and its full sources under sources_key, to be written in one round trip."""
+        key = self._key(session_id)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.set(sources_key, orjson.dumps(sources), ex=sources_ttl_seconds)
+        pipe.rpush(key, orjson.dumps(entry))
+        pipe.ltrim(key, -self.max_entries, -1)
+        pipe.expire(key, self.ttl_seconds)
+        self._queue.put(pipe)
+    
+    def clear(self, session_id: str):
+        """Queue deletion of a session's history, ordered after its pending appends."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.delete(self._key(session_id))
+        self._queue.put(pipe)
+    
+    def _flush_loop(self):
+        while True:
+            pipe = self._queue.get()
+            try:
+                pipe.execute()
+            except Exception as e:
+                logger.error("Error persisting chat history: %s", e)
+
+chat_history = ChatHistoryStore(redis_client, MAX_CHAT_HISTORY, HISTORY_TTL_SECONDS)
+
+def get_session_id() -> str:
+    """Return the current session's ID, creating one if needed."""
+    if 'session_id' not in session:
+        session['session_id'] = str(uuid.uuid4())
+    return session['session_id']
+
+def record_chat_entry(session_id: str, user_question: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a chat entry for a result and add a trimmed copy to the session's history."""
+    chat_entry = {
+        'id': str(uuid.uuid4()),
+        'question': user_question,
+        'answer': result['answer'],
+        'sources': result['sources'],
+        'timestamp': result['timestamp'],
+        'model_used': result.get('model_used'),
+        'documents_retrieved': result.get('documents_retrieved', 0)
+    }
+    
+    # Keep full sources in Redis and only a trimmed copy in the history
+    history_entry = dict(chat_entry, sources=[trim_source(source) for source in result['sources']])
+    chat_history.append(session_id, history_entry, f"sources:{chat_entry['id']}", result['sources'],
+                        SOURCES_TTL_SECONDS)
+    
+    return chat_entry
+
+def trim_source(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a retrieved source to the fields shown in the chat history."""
+    return {
+        'rank': source['rank'],
+        'service_name': source['service_name'],
+        'document_type': source['document_type'],
+        'similarity_score': source['similarity_score'],
+        'content_preview': source['content_preview'][:SESSION_PREVIEW_CHARS]
+    }
+
 def initialize_rag_system():
     """Initialize the RAG system with proper configuration."""
     global rag_system
@@ -52,21 +207,21 @@ def initialize_rag_system():
             vector_bucket_name="YOUR-VECTOR-BUCKET",
             index_name="aws-documentation",
             s3vectors_region="us-east-1",
-            bedrock_region="us-east-1"
+            bedrock_region="us-east-1",
+            # Share Titan embeddings of repeated questions across Gunicorn workers
+            embedding_cache_dir=os.environ.get('EMBEDDING_CACHE_DIR')
         )
         logger.info("RAG System initialized successfully")
         return True
     except Exception as e:
-        logger.error(f"Failed to initialize RAG system: {str(e)}")
+        logger.error("Failed to initialize RAG system: %s", e)
         return False
 
 @app.route('/')
 def index():
     """Main page route."""
     # Initialize session if needed
-    if 'session_id' not in session:
-        session['session_id'] = str(uuid.uuid4())
-        session['chat_history'] = []
+    get_session_id()
     
     return render_template('index.html')
 
@@ -91,25 +246,11 @@ def ask_question():
             }), 500
         
         # Process the question
-        logger.info(f"Processing question: {user_question}")
+        logger.info("Processing question: %s", user_question)
         result = rag_system.process_question(user_question, top_k=5)
         
         # Add to chat history
-        if 'chat_history' not in session:
-            session['chat_history'] = []
-        
-        chat_entry = {
-            'id': str(uuid.uuid4()),
-            'question': user_question,
-            'answer': result['answer'],
-            'sources': result['sources'],
-            'timestamp': result['timestamp'],
-            'model_used': result['model_used'],
-            'documents_retrieved': result['documents_retrieved']
-        }
-        
-        session['chat_history'].append(chat_entry)
-        session.modified = True
+        chat_entry = record_chat_entry(get_session_id(), user_question, result)
         
         return jsonify({
             'success': True,
@@ -117,23 +258,92 @@ def ask_question():
         })
         
     except Exception as e:
-        logger.error(f"Error processing question: {str(e)}")
+        logger.error("Error processing question: %s", e)
         return jsonify({
             'success': False,
             'error': f'An error occurred while processing your question: {str(e)}'
         }), 500
 
+@app.route('/api/ask/stream', methods=['GET', 'POST'])
+def ask_question_stream():
+    """Process a user question, streaming progress as Server-Sent Events.
+
+    Accepts the question as a JSON body (POST) or a 'question' query parameter
+    (GET, for EventSource clients). Emits 'retrieving', 'sources', one
+    'answer_delta' per Claude text chunk, and a final 'complete' event.
+    """
+    if request.method == 'POST':
+        user_question = (request.get_json(silent=True) or {}).get('question', '').strip()
+    else:
+        user_question = request.args.get('question', '').strip()
+    
+    if not user_question:
+        return jsonify({
+            'success': False,
+            'error': 'Please provide a question'
+        }), 400
+    
+    if not rag_system:
+        return jsonify({
+            'success': False,
+            'error': 'RAG system not initialized. Please check AWS credentials and try again.'
+        }), 500
+    
+    # Resolve the session before streaming; the session is saved before the body is sent
+    session_id = get_session_id()
+    
+    def generate_events():
+        try:
+            for event in rag_system.stream_question(user_question, top_k=5):
+                if event['stage'] == 'complete':
+                    event['entry_id'] = record_chat_entry(session_id, user_question, event['result'])['id']
+                yield b"data: " + orjson.dumps(event) + b"\n\n"
+        except Exception as e:
+            logger.error("Error streaming question: %s", e)
+            error_event = {'stage': 'error', 'error': f'An error occurred while processing your question: {str(e)}'}
+            yield b"data: " + orjson.dumps(error_event) + b"\n\n"
+    
+    logger.info("Streaming question: %s", user_question)
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/history')
 def get_chat_history():
     """Get chat history for the current session."""
     try:
-        history = session.get('chat_history', [])
+        history = chat_history.get(get_session_id())
         return jsonify({
             'success': True,
             'data': history
         })
     except Exception as e:
-        logger.error(f"Error getting chat history: {str(e)}")
+        logger.error("Error getting chat history: %s", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/history/<entry_id>/sources')
+def get_entry_sources(entry_id):
+    """Get the full retrieved sources for a chat history entry."""
+    try:
+        history_ids = {entry['id'] for entry in chat_history.get(get_session_id())}
+        sources = redis_client.get(f"sources:{entry_id}") if entry_id in history_ids else None
+        if sources is None:
+            return jsonify({
+                'success': False,
+                'error': 'Sources not found'
+            }), 404
+        
+        return jsonify({
+            'success': True,
+            'data': orjson.loads(sources)
+        })
+    except Exception as e:
+        logger.error("Error getting sources: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -143,14 +353,13 @@ def get_chat_history():
 def clear_chat_history():
     """Clear chat history for the current session."""
     try:
-        session['chat_history'] = []
-        session.modified = True
+        chat_history.clear(get_session_id())
         return jsonify({
             'success': True,
             'message': 'Chat history cleared'
         })
     except Exception as e:
-        logger.error(f"Error clearing chat history: {str(e)}")
+        logger.error("Error clearing chat history: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
@@ -163,7 +372,7 @@ def health_check():
         # Check if RAG system is working
         system_status = {
             'rag_system_initialized': rag_system is not None,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': iso_now(),
             'status': 'healthy' if rag_system else 'degraded'
         }
         
@@ -180,49 +389,10 @@ def health_check():
 @app.route('/api/examples')
 def get_example_questions():
     """Get example questions for users."""
-    examples = [
-        {
-            'category': 'Compute & Serverless',
-            'questions': [
-                'How do I scale Lambda functions automatically?',
-                'What are the best practices for Lambda memory optimization?',
-                'When should I use EC2 vs Lambda for my workload?',
-                'How to implement auto-scaling for EC2 instances?'
-            ]
-        },
-        {
-            'category': 'Storage & Databases',
-            'questions': [
-                'What are the best security practices for S3 buckets?',
-                'How to optimize DynamoDB read and write performance?',
-                'What are the different S3 storage classes and when to use them?',
-                'How to implement RDS backup and recovery strategies?'
-            ]
-        },
-        {
-            'category': 'Networking & Security',
-            'questions': [
-                'How to configure VPC security groups vs NACLs?',
-                'What are IAM policy best practices?',
-                'How to implement AWS security monitoring?',
-                'What are the Route 53 DNS routing policies?'
-            ]
-        },
-        {
-            'category': 'Architecture & Best Practices',
-            'questions': [
-                'What are the AWS Well-Architected Framework principles?',
-                'How to implement cost optimization strategies?',
-                'What are the best practices for multi-region deployments?',
-                'How to design fault-tolerant AWS architectures?'
-            ]
-        }
-    ]
+    if request.headers.get('If-None-Match') == EXAMPLES_ETAG:
+        return Response(status=304, headers=EXAMPLES_HEADERS)
     
-    return jsonify({
-        'success': True,
-        'data': examples
-    })
+    return Response(EXAMPLES_PAYLOAD, mimetype='application/json', headers=EXAMPLES_HEADERS)
 
 @app.errorhandler(404)
 def not_found(error):
@@ -244,9 +414,10 @@ if __name__ == '__main__':
         print("✅ RAG System initialized successfully")
         print("🌐 Starting web server...")
         print("📱 Open http://localhost:5000 in your browser")
+        print("⚠️  Development server only - use 'gunicorn -c gunicorn_conf.py app:app' in production")
         print("=" * 60)
         
-        # Run Flask app
+        # Run Flask development server
         app.run(
             host='0.0.0.0',
             port=5000,
@@ -21,26 +21,131 @@ Usage:
     python3 aws_docs_rag_system.py --question "How do I scale Lambda functions?"
 """
 
-import json
+import orjson
 import boto3
+from botocore.config import Config
 import argparse
+import atexit
+import functools
+import hashlib
 import logging
-from typing import List, Dict, Any, Tuple
-from datetime import datetime
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+import numpy as np
+from concurrent.futures import Future
+from typing import List, Dict, Any, Tuple, Optional, Iterator
+from datetime import datetime, timezone
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+def configure_logging(level: int = logging.INFO):
+    """Send log records through a queue so request threads never block on handler I/O.
+
+    A QueueListener thread owns the stream handler; logging calls on the hot
+    path only enqueue the record. Safe to call more than once.
+    """
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    if any(isinstance(handler, QueueHandler) for handler in root_logger.handlers):
+        return
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    root_logger.addHandler(QueueHandler(log_queue))
 
 # Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# [epoch second, ISO string] of the last formatted timestamp
+_timestamp_cache = [0, ""]
+
+def iso_now() -> str:
+    """Return the current UTC time as an ISO 8601 string, formatted at most once per second."""
+    now = int(time.time())
+    if now != _timestamp_cache[0]:
+        _timestamp_cache[1] = datetime.fromtimestamp(now, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        _timestamp_cache[0] = now
+    return _timestamp_cache[1]
+
+# Prefix of the fallback answer returned when Claude fails; such answers are never cached
+ERROR_RESPONSE_PREFIX = "I apologize, but I encountered an error while generating a response"
+
+# Static parts of the Claude prompt, built once at import
+PROMPT_HEADER = "You are an expert AWS solutions architect and documentation assistant. A user has asked a question about AWS services, and I've retrieved the most relevant documentation sections using semantic search."
+
+PROMPT_FOOTER = """
+
+**Instructions:**
+1. Provide a comprehensive, accurate answer to the user's question based on the retrieved documentation
+2. Structure your response with clear headings and bullet points where appropriate
+3. Include specific AWS service names, features, and best practices mentioned in the context
+4. If the context doesn't fully answer the question, acknowledge what information is available and what might be missing
+5. Provide actionable recommendations and next steps where relevant
+6. At the end, include a "Sources" section referencing which retrieved documents you used
+7. Suggest 2-3 related follow-up questions the user might want to ask
+
+**Response Format:**
+## Answer
+
+[Your comprehensive answer here]
+
+## Key Points
+- [Important point 1]
+- [Important point 2]
+- [Important point 3]
+
+## Recommendations
+- [Actionable recommendation 1]
+- [Actionable recommendation 2]
+
+## Sources
+- Source 1: [Service Name] - [Document Type] (Similarity: X%)
+- Source 2: [Service Name] - [Document Type] (Similarity: X%)
+
+## Related Questions You Might Ask
+1. [Related question 1]
+2. [Related question 2]
+3. [Related question 3]
+
+Please provide a helpful, accurate, and well-structured response based on the AWS documentation context provided."""
+
+# Upper bound on Claude's answer length; the structured answer format rarely needs more
+MAX_ANSWER_TOKENS = 2000
+
+# Per-rank character budgets for retrieved content in the prompt (the last one
+# applies to any further ranks), and the overall cap across all sources
+CONTEXT_CHAR_BUDGETS = [1500, 1000, 700, 500, 400]
+MAX_CONTEXT_CHARS = 4000
+
+# Below this top-1 similarity (percent) the retrieved documents are not worth sending to Claude
+MIN_SIMILARITY_SCORE = 40.0
+
+LOW_CONFIDENCE_TEMPLATE = (
+    "I couldn't find documentation that confidently matches your question "
+    "(best match similarity: {top_similarity}%). Please try rephrasing it or "
+    "asking about a specific AWS service."
+)
+
 class AWSDocsRAGSystem:
     def __init__(self, 
                  vector_bucket_name: str, 
                  index_name: str, 
                  s3vectors_region: str = "us-east-1",
-                 bedrock_region: str = "us-east-1"):
+                 bedrock_region: str = "us-east-1",
+                 semantic_cache_size: int = 256,
+                 semantic_cache_threshold: float = 0.97,
+                 embedding_cache_size: int = 2048,
+                 embedding_cache_dir: Optional[str] = None):
         """Initialize the AWS Documentation RAG System."""
         
         self.vector_bucket_name = vector_bucket_name
@@ -48,83 +153,205 @@ class AWSDocsRAGSystem:
         self.s3vectors_region = s3vectors_region
         self.bedrock_region = bedrock_region
         
-        # Initialize AWS clients
-        self.s3vectors_client = boto3.client('s3vectors', region_name=s3vectors_region)
-        self.bedrock_client = boto3.client('bedrock-runtime', region_name=bedrock_region)
+        # Initialize AWS clients once so their connection pools stay warm across questions
+        client_config = Config(
+            max_pool_connections=64,
+            tcp_keepalive=True,
+            retries={'max_attempts': 3, 'mode': 'adaptive'}
+        )
+        self.s3vectors_client = boto3.client('s3vectors', region_name=s3vectors_region, config=client_config)
+        self.bedrock_client = boto3.client('bedrock-runtime', region_name=bedrock_region, config=client_config)
+        # Use us-west-2 for Titan embeddings (where it's available)
+        self.titan_client = boto3.client('bedrock-runtime', region_name='us-west-2', config=client_config)
         
         # Model configurations
         self.embedding_model = "amazon.titan-embed-text-v2:0"
         self.llm_model = "anthropic.claude-3-5-sonnet-20240620-v1:0"
+        self.embedding_dimensions = 1024
+        
+        # Semantic cache: ring buffer of recent query embeddings and their answers.
+        # Titan embeddings are L2-normalized, so a dot product is the cosine similarity.
+        # Rows stay float32 so each lookup is a single BLAS sgemv with no upcast copy.
+        self.semantic_cache_threshold = semantic_cache_threshold
+        self._cache_vectors = np.zeros((semantic_cache_size, self.embedding_dimensions), dtype=np.float32)
+        self._cache_top_ks = np.zeros(semantic_cache_size, dtype=np.int64)
+        self._cache_entries: List[Optional[Dict[str, Any]]] = [None] * semantic_cache_size
+        self._cache_count = 0
+        self._cache_next = 0
+        self._cache_lock = threading.Lock()
+        
+        # Exact-match embedding caches: in-process LRU, optionally backed by a
+        # disk cache shared across processes and restarts
+        self._cached_query_embedding = functools.lru_cache(maxsize=embedding_cache_size)(self.fetch_query_embedding)
+        self._embedding_disk_cache = None
+        if embedding_cache_dir:
+            if diskcache is None:
+                logger.warning("diskcache not installed; embedding disk cache disabled")
+            else:
+                self._embedding_disk_cache = diskcache.FanoutCache(embedding_cache_dir, shards=8)
+        
+        # In-flight S3 Vectors queries, keyed by (embedding bytes, top_k)
+        self._inflight_queries: Dict[Tuple[bytes, int], Future] = {}
+        self._inflight_lock = threading.Lock()
+        
+        logger.info("Initialized RAG System:")
+        logger.info("  - Vector Bucket: %s", vector_bucket_name)
+        logger.info("  - Vector Index: %s", index_name)
+        logger.info("  - S3 Vectors Region: %s", s3vectors_region)
+        logger.info("  - Bedrock Region: %s", bedrock_region)
+        logger.info("  - LLM Model: %s", self.llm_model)
+
+    def fetch_query_embedding(self, normalized_query: str) -> np.ndarray:
+        """Call Titan Text Embeddings V2, consulting the disk cache first when configured."""
+        disk_key = None
+        if self._embedding_disk_cache is not None:
+            disk_key = hashlib.sha256(
+                f"{self.embedding_model}|{self.embedding_dimensions}|{normalized_query}".encode('utf-8')
+            ).hexdigest()
+            cached = self._embedding_disk_cache.get(disk_key)
+            if cached is not None:
+                return cached
+        
+        body = orjson.dumps({
+            "inputText": normalized_query,
+            "dimensions": self.embedding_dimensions,
+            "normalize": True,
+            "embeddingTypes": ["float"]
+        })
+        
+        response = self.titan_client.invoke_model(
+            body=body,
+            modelId=self.embedding_model,
+            accept="application/json",
+            contentType="application/json"
+        )
         
-        logger.info(f"Initialized RAG System:")
-        logger.info(f"  - Vector Bucket: {vector_bucket_name}")
-        logger.info(f"  - Vector Index: {index_name}")
-        logger.info(f"  - S3 Vectors Region: {s3vectors_region}")
-        logger.info(f"  - Bedrock Region: {bedrock_region}")
-        logger.info(f"  - LLM Model: {self.llm_model}")
+        response_body = orjson.loads(response["body"].read())
+        # Convert to float32 once; the array is shared by the caches, so freeze it
+        embedding = np.asarray(response_body["embedding"], dtype=np.float32)
+        embedding.flags.writeable = False
+        
+        if disk_key is not None:
+            self._embedding_disk_cache.set(disk_key, embedding)
+        return embedding
 
-    def generate_query_embedding(self, query_text: str) -> List[float]:
+    def generate_query_embedding(self, query_text: str) -> Optional[np.ndarray]:
         """Generate embedding for query text using Titan Text Embeddings V2."""
         try:
-            # Use us-west-2 for Titan embeddings (where it's available)
-            titan_client = boto3.client('bedrock-runtime', region_name='us-west-2')
-            
-            body = json.dumps({
-                "inputText": query_text,
-                "dimensions": 1024,
-                "normalize": True,
-                "embeddingTypes": ["float"]
-            })
+            # Exact duplicates (ignoring case and whitespace) are served from the LRU cache
+            normalized_query = " ".join(query_text.strip().lower().split())
+            embedding = self._cached_query_embedding(normalized_query)
             
-            response = titan_client.invoke_model(
-                body=body,
-                modelId=self.embedding_model,
-                accept="application/json",
-                contentType="application/json"
-            )
-            
-            response_body = json.loads(response["body"].read())
-            embedding = response_body["embedding"]
-            
-            logger.info(f"Generated embedding for query: '{query_text[:50]}...'")
+            logger.info("Generated embedding for query: '%s...'", query_text[:50])
             return embedding
             
         except Exception as e:
-            logger.error(f"Error generating query embedding: {str(e)}")
+            logger.error("Error generating query embedding: %s", e)
             return None
 
-    def search_relevant_docs(self, query_text: str, top_k: int = 5) -> List[Dict[str, Any]]:
-        """Search for relevant documentation using S3 Vectors."""
-        try:
-            # Generate query embedding
-            query_embedding = self.generate_query_embedding(query_text)
-            if not query_embedding:
-                return []
+    def lookup_semantic_cache(self, query_embedding: np.ndarray, top_k: int) -> Optional[Dict[str, Any]]:
+        """Return a cached result for a near-duplicate question, if one exists."""
+        with self._cache_lock:
+            if self._cache_count == 0:
+                return None
             
-            # Search vectors
+            similarities = self._cache_vectors[:self._cache_count] @ query_embedding
+            # Only answers retrieved with the same top_k can be reused
+            similarities[self._cache_top_ks[:self._cache_count] != top_k] = -np.inf
+            best = int(np.argmax(similarities))
+            best_similarity = float(similarities[best])
+            cached_result = self._cache_entries[best]
+        
+        if best_similarity < self.semantic_cache_threshold:
+            return None
+        
+        logger.info("Semantic cache hit (similarity: %.4f)", best_similarity)
+        result = dict(cached_result)
+        result['timestamp'] = iso_now()
+        result['cache_hit'] = True
+        return result
+
+    def store_semantic_cache(self, query_embedding: np.ndarray, top_k: int, result: Dict[str, Any]):
+        """Remember a generated result, evicting the oldest entry when the cache is full."""
+        capacity = len(self._cache_entries)
+        if capacity == 0:
+            return
+        
+        with self._cache_lock:
+            slot = self._cache_next
+            self._cache_vectors[slot] = query_embedding
+            self._cache_top_ks[slot] = top_k
+            self._cache_entries[slot] = result
+            self._cache_next = (slot + 1) % capacity
+            self._cache_count = min(self._cache_count + 1, capacity)
+
+    def query_vectors_coalesced(self, query_embedding: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """Query S3 Vectors, sharing a single call among concurrent identical queries.
+
+        QueryVectors takes one query vector per call, so concurrent requests
+        cannot be packed into a batch; instead, requests for the same embedding
+        and top_k that arrive while a call is in flight wait for its result.
+        """
+        key = (query_embedding.tobytes(), top_k)
+        with self._inflight_lock:
+            future = self._inflight_queries.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self._inflight_queries[key] = future
+        
+        if not is_owner:
+            return future.result()
+        
+        try:
             response = self.s3vectors_client.query_vectors(
                 vectorBucketName=self.vector_bucket_name,
                 indexName=self.index_name,
-                queryVector={'float32': query_embedding},
+                # boto3 only accepts a list here, so convert at the API boundary
+                queryVector={'float32': query_embedding.tolist()},
                 topK=top_k,
                 returnDistance=True,
                 returnMetadata=True
             )
-            
             vectors = response.get('vectors', [])
-            logger.info(f"Found {len(vectors)} relevant documents")
+            future.set_result(vectors)
+            return vectors
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._inflight_lock:
+                self._inflight_queries.pop(key, None)
+
+    def search_relevant_docs(self, query_text: str, top_k: int = 5,
+                             query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Search for relevant documentation using S3 Vectors."""
+        try:
+            # Generate query embedding unless the caller already has one
+            if query_embedding is None:
+                query_embedding = self.generate_query_embedding(query_text)
+            if query_embedding is None:
+                return []
+            
+            # Search vectors
+            vectors = self.query_vectors_coalesced(query_embedding, top_k)
+            logger.info("Found %s relevant documents", len(vectors))
+            
+            # Convert all distances to similarity percentages in one vectorized pass
+            distances = np.fromiter((vector.get('distance', 1.0) for vector in vectors),
+                                    dtype=np.float64, count=len(vectors))
+            similarities = np.round((1.0 - distances) * 100.0, 1)
             
             # Process and enrich results
             processed_results = []
-            for i, vector in enumerate(vectors, 1):
+            for i, (vector, similarity, distance) in enumerate(
+                    zip(vectors, similarities.tolist(), distances.tolist()), 1):
                 metadata = vector.get('metadata', {})
-                distance = vector.get('distance', 1.0)
-                similarity = (1 - distance) * 100
                 
                 processed_result = {
                     'rank': i,
                     'key': vector.get('key', 'unknown'),
-                    'similarity_score': round(similarity, 1),
+                    'similarity_score': similarity,
                     'service_name': metadata.get('service_name', 'Unknown'),
                     'document_type': metadata.get('document_type', 'documentation'),
                     'content_preview': metadata.get('content_preview', ''),
@@ -137,128 +364,224 @@ class AWSDocsRAGSystem:
             return processed_results
             
         except Exception as e:
-            logger.error(f"Error searching documents: {str(e)}")
+            logger.error("Error searching documents: %s", e)
             return []
 
-    def generate_rag_response(self, user_question: str, relevant_docs: List[Dict[str, Any]]) -> str:
-        """Generate comprehensive response using Claude 3.5 Sonnet with retrieved context."""
-        try:
-            # Prepare context from retrieved documents
-            context_parts = []
-            for doc in relevant_docs:
-                context_parts.append(f"""
-**Source {doc['rank']}** (Similarity: {doc['similarity_score']}%)
-Service: {doc['service_name']}
-Type: {doc['document_type']}
-Content: {doc['content_preview']}
-""")
-            
-            context = "\n".join(context_parts)
-            
-            # Create comprehensive prompt for Claude
-            prompt = f"""You are an expert AWS solutions architect and documentation assistant. A user has asked a question about AWS services, and I've retrieved the most relevant documentation sections using semantic search.
-
-**User Question:** {user_question}
-
-**Retrieved AWS Documentation Context:**
-{context}
-
-**Instructions:**
-1. Provide a comprehensive, accurate answer to the user's question based on the retrieved documentation
-2. Structure your response with clear headings and bullet points where appropriate
-3. Include specific AWS service names, features, and best practices mentioned in the context
-4. If the context doesn't fully answer the question, acknowledge what information is available and what might be missing
-5. Provide actionable recommendations and next steps where relevant
-6. At the end, include a "Sources" section referencing which retrieved documents you used
-7. Suggest 2-3 related follow-up questions the user might want to ask
-
-**Response Format:**
-## Answer
-
-[Your comprehensive answer here]
-
-## Key Points
-- [Important point 1]
-- [Important point 2]
-- [Important point 3]
+    def build_prompt_prefix(self, user_question: str) -> str:
+        """Build the part of the Claude prompt that does not depend on retrieval."""
+        return f"{PROMPT_HEADER}\n\n**User Question:** {user_question}\n\n**Retrieved AWS Documentation Context:**\n"
 
-## Recommendations
-- [Actionable recommendation 1]
-- [Actionable recommendation 2]
-
-## Sources
-- Source 1: [Service Name] - [Document Type] (Similarity: X%)
-- Source 2: [Service Name] - [Document Type] (Similarity: X%)
+    def build_prompt(self, prompt_prefix: str, relevant_docs: List[Dict[str, Any]]) -> str:
+        """Complete the Claude prompt with the retrieved documentation context."""
+        # Prepare context from retrieved documents, giving higher-ranked documents
+        # a larger share of the character budget
+        context_parts = []
+        remaining_chars = MAX_CONTEXT_CHARS
+        for i, doc in enumerate(relevant_docs):
+            if remaining_chars <= 0:
+                break
+            budget = CONTEXT_CHAR_BUDGETS[min(i, len(CONTEXT_CHAR_BUDGETS) - 1)]
+            content = doc['content_preview'][:min(budget, remaining_chars)]
+            remaining_chars -= len(content)
+            context_parts.append(
+                f"\n**Source {doc['rank']}** (Similarity: {doc['similarity_score']}%)\n"
+                f"Service: {doc['service_name']}\n"
+                f"Type: {doc['document_type']}\n"
+                f"Content: {content}\n"
+            )
+        
+        return prompt_prefix + "\n".join(context_parts) + PROMPT_FOOTER
 
-## Related Questions You Might Ask
-1. [Related question 1]
-2. [Related question 2]
-3. [Related question 3]
+    def build_claude_request_body(self, prompt: str) -> bytes:
+        """Build the Bedrock request body for Claude 3.5 Sonnet."""
+        return orjson.dumps({
+            "anthropic_version": "bedrock-2023-05-31",
+            "max_tokens": MAX_ANSWER_TOKENS,
+            "temperature": 0.1,
+            "messages": [
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        })
 
-Please provide a helpful, accurate, and well-structured response based on the AWS documentation context provided."""
+    def generate_rag_response(self, user_question: str, relevant_docs: List[Dict[str, Any]],
+                              prompt_prefix: Optional[str] = None) -> str:
+        """Generate comprehensive response using Claude 3.5 Sonnet with retrieved context."""
+        try:
+            # Create comprehensive prompt for Claude
+            if prompt_prefix is None:
+                prompt_prefix = self.build_prompt_prefix(user_question)
+            prompt = self.build_prompt(prompt_prefix, relevant_docs)
 
             # Call Claude 3.5 Sonnet
-            body = json.dumps({
-                "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4000,
-                "temperature": 0.1,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
-            })
-            
             response = self.bedrock_client.invoke_model(
-                body=body,
+                body=self.build_claude_request_body(prompt),
                 modelId=self.llm_model,
                 accept="application/json",
                 contentType="application/json"
             )
             
-            response_body = json.loads(response["body"].read())
+            response_body = orjson.loads(response["body"].read())
             claude_response = response_body["content"][0]["text"]
             
             logger.info("Generated RAG response using Claude 3.5 Sonnet")
             return claude_response
             
         except Exception as e:
-            logger.error(f"Error generating RAG response: {str(e)}")
-            return f"I apologize, but I encountered an error while generating a response: {str(e)}"
+            logger.error("Error generating RAG response: %s", e)
+            return f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
 
-    def process_question(self, user_question: str, top_k: int = 5) -> Dict[str, Any]:
-        """Process a user question through the complete RAG pipeline."""
-        logger.info(f"Processing question: '{user_question}'")
-        
-        # Step 1: Search for relevant documentation
-        print("🔍 Searching AWS documentation...")
-        relevant_docs = self.search_relevant_docs(user_question, top_k)
+    def stream_rag_response(self, user_question: str, relevant_docs: List[Dict[str, Any]],
+                            prompt_prefix: Optional[str] = None) -> Iterator[str]:
+        """Stream Claude 3.5 Sonnet's response text as it is generated."""
+        try:
+            if prompt_prefix is None:
+                prompt_prefix = self.build_prompt_prefix(user_question)
+            prompt = self.build_prompt(prompt_prefix, relevant_docs)
+
+            response = self.bedrock_client.invoke_model_with_response_stream(
+                body=self.build_claude_request_body(prompt),
+                modelId=self.llm_model,
+                accept="application/json",
+                contentType="application/json"
+            )
+            
+            for event in response["body"]:
+                chunk = event.get("chunk")
+                if not chunk:
+                    continue
+                chunk_body = orjson.loads(chunk["bytes"])
+                if chunk_body.get("type") == "content_block_delta":
+                    yield chunk_body["delta"].get("text", "")
+            
+            logger.info("Streamed RAG response using Claude 3.5 Sonnet")
+            
+        except Exception as e:
+            logger.error("Error streaming RAG response: %s", e)
+            yield f"{ERROR_RESPONSE_PREFIX}: {str(e)}"
+
+    def prepare_question(self, user_question: str, top_k: int) -> Tuple[Optional[np.ndarray], str, Optional[Dict[str, Any]]]:
+        """Embed the question and check the semantic cache.
+
+        Returns (query_embedding, prompt_prefix, cached_result).
+        """
+        query_embedding = self.generate_query_embedding(user_question)
+        prompt_prefix = self.build_prompt_prefix(user_question)
         
-        if not relevant_docs:
-            return {
-                'question': user_question,
-                'answer': "I couldn't find relevant documentation for your question. Please try rephrasing or asking about a different AWS topic.",
-                'sources': [],
-                'timestamp': datetime.now().isoformat()
-            }
-        
-        # Step 2: Generate comprehensive response
-        print("🧠 Generating comprehensive answer with Claude 3.5 Sonnet...")
-        rag_response = self.generate_rag_response(user_question, relevant_docs)
+        # Check for a near-duplicate answer
+        cached_result = None
+        if query_embedding is not None:
+            cached_result = self.lookup_semantic_cache(query_embedding, top_k)
+            if cached_result:
+                cached_result['question'] = user_question
         
-        # Step 3: Prepare final response
+        return query_embedding, prompt_prefix, cached_result
+
+    def build_no_results_response(self, user_question: str) -> Dict[str, Any]:
+        """Build the response returned when no documentation matches the question."""
+        return {
+            'question': user_question,
+            'answer': "I couldn't find relevant documentation for your question. Please try rephrasing or asking about a different AWS topic.",
+            'sources': [],
+            'timestamp': iso_now()
+        }
+
+    def build_low_confidence_response(self, user_question: str, relevant_docs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Build the response returned when even the best match is too dissimilar to use."""
+        return {
+            'question': user_question,
+            'answer': LOW_CONFIDENCE_TEMPLATE.format(top_similarity=relevant_docs[0]['similarity_score']),
+            'sources': relevant_docs,
+            'timestamp': iso_now(),
+            'model_used': None,  # Claude is not called
+            'documents_retrieved': len(relevant_docs)
+        }
+
+    def finalize_response(self, user_question: str, rag_response: str, relevant_docs: List[Dict[str, Any]],
+                          query_embedding: Optional[np.ndarray], top_k: int) -> Dict[str, Any]:
+        """Build the final response and remember it in the semantic cache."""
         result = {
             'question': user_question,
             'answer': rag_response,
             'sources': relevant_docs,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': iso_now(),
             'model_used': self.llm_model,
             'documents_retrieved': len(relevant_docs)
         }
         
+        if query_embedding is not None and ERROR_RESPONSE_PREFIX not in rag_response:
+            self.store_semantic_cache(query_embedding, top_k, result)
+        
         return result
 
+    def process_question(self, user_question: str, top_k: int = 5) -> Dict[str, Any]:
+        """Process a user question through the complete RAG pipeline."""
+        logger.info("Processing question: '%s'", user_question)
+        
+        # Step 1: Embed the question and check for a near-duplicate answer
+        query_embedding, prompt_prefix, cached_result = self.prepare_question(user_question, top_k)
+        if cached_result:
+            return cached_result
+        
+        # Step 2: Search for relevant documentation
+        print("🔍 Searching AWS documentation...")
+        relevant_docs = self.search_relevant_docs(user_question, top_k, query_embedding=query_embedding)
+        
+        if not relevant_docs:
+            return self.build_no_results_response(user_question)
+        
+        # Skip Claude entirely when nothing retrieved is a confident match
+        if relevant_docs[0]['similarity_score'] < MIN_SIMILARITY_SCORE:
+            return self.build_low_confidence_response(user_question, relevant_docs)
+        
+        # Step 3: Generate comprehensive response
+        print("🧠 Generating comprehensive answer with Claude 3.5 Sonnet...")
+        rag_response = self.generate_rag_response(user_question, relevant_docs, prompt_prefix)
+        
+        # Step 4: Prepare final response
+        return self.finalize_response(user_question, rag_response, relevant_docs, query_embedding, top_k)
+
+    def stream_question(self, user_question: str, top_k: int = 5) -> Iterator[Dict[str, Any]]:
+        """Process a user question, yielding progress events as each stage completes.
+
+        Events are dicts with a 'stage' key: 'retrieving', 'sources', 'answer_delta'
+        (one per Claude text chunk) and finally 'complete' carrying the full result.
+        """
+        logger.info("Streaming question: '%s'", user_question)
+        yield {'stage': 'retrieving'}
+        
+        query_embedding, prompt_prefix, cached_result = self.prepare_question(user_question, top_k)
+        if cached_result:
+            yield {'stage': 'sources', 'sources': cached_result['sources']}
+            yield {'stage': 'answer_delta', 'text': cached_result['answer']}
+            yield {'stage': 'complete', 'result': cached_result}
+            return
+        
+        relevant_docs = self.search_relevant_docs(user_question, top_k, query_embedding=query_embedding)
+        yield {'stage': 'sources', 'sources': relevant_docs}
+        
+        if not relevant_docs:
+            result = self.build_no_results_response(user_question)
+        elif relevant_docs[0]['similarity_score'] < MIN_SIMILARITY_SCORE:
+            result = self.build_low_confidence_response(user_question, relevant_docs)
+        else:
+            result = None
+        
+        if result:
+            yield {'stage': 'answer_delta', 'text': result['answer']}
+            yield {'stage': 'complete', 'result': result}
+            return
+        
+        answer_parts = []
+        for text in self.stream_rag_response(user_question, relevant_docs, prompt_prefix):
+            answer_parts.append(text)
+            yield {'stage': 'answer_delta', 'text': text}
+        
+        result = self.finalize_response(user_question, "".join(answer_parts), relevant_docs, query_embedding, top_k)
+        yield {'stage': 'complete', 'result': result}
+
     def interactive_chat(self):
         """Interactive chat interface for the RAG system."""
         print("🚀 AWS Documentation RAG System - Interactive Chat")
@@ -16,13 +16,20 @@ Usage:
     python insert_embeddings_to_s3_vectors.py
 """
 
-import json
+import orjson
+import gzip
 import os
+import queue
+import random
+import threading
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 import numpy as np
-from typing import List, Dict, Any
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Iterator
 import time
-from datetime import datetime
 import logging
 
 # Configure logging
@@ -36,15 +43,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Matrix input written by generate_embeddings_example.py with output_format="npy"
+EMBEDDINGS_MATRIX_FILE = "embeddings.npy"
+EMBEDDINGS_METADATA_FILE = "embeddings_metadata.json"
+
+# Sharded input written with output_format="jsonl.gz"
+EMBEDDINGS_SHARD_PREFIX = "embeddings-"
+EMBEDDINGS_SHARD_SUFFIX = ".jsonl.gz"
+
+# Error codes worth retrying with backoff; concurrent batches make throttling more likely
+RETRYABLE_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException'}
+
+# Queued after the last record to tell each upload worker to finish
+END_OF_STREAM = object()
+
+# Embedding files decoded per worker-process task, and tasks kept in flight per
+# process; the window bounds how many prepared records wait for the uploaders
+PARSE_BATCH_SIZE = 64
+PARSE_BATCHES_IN_FLIGHT_PER_PROCESS = 2
+
 class S3VectorsInserter:
-    def __init__(self, vector_bucket_name: str, index_name: str, region_name: str = "us-east-1"):
-        """Initialize the S3 Vectors inserter."""
+    def __init__(self, vector_bucket_name: str, index_name: str, region_name: str = "us-east-1",
+                 max_concurrent_batches: int = 8, max_retries: int = 5, parse_processes: int = None):
+        """Initialize the S3 Vectors inserter.
+        
+        parse_processes sets how many processes decode individual embedding files
+        (defaults to os.cpu_count(); 1 parses in the main process).
+        """
         self.vector_bucket_name = vector_bucket_name
         self.index_name = index_name
         self.region_name = region_name
+        self.max_concurrent_batches = max_concurrent_batches
+        self.max_retries = max_retries
+        self.parse_processes = parse_processes
         
-        # Initialize S3 Vectors client
-        self.s3vectors_client = boto3.client('s3vectors', region_name=region_name)
+        # Initialize S3 Vectors client (thread-safe; shared by all batch workers)
+        self.s3vectors_client = boto3.client(
+            's3vectors',
+            region_name=region_name,
+            config=Config(
+                max_pool_connections=max_concurrent_batches * 2,
+                retries={'max_attempts': 10, 'mode': 'adaptive'},
+                tcp_keepalive=True,
+                read_timeout=60,
+                connect_timeout=10
+            )
+        )
+        self.stats_lock = threading.Lock()
         
         # Statistics
         self.stats = {
@@ -52,36 +97,40 @@ class S3VectorsInserter:
             'successful_insertions': 0,
             'failed_insertions': 0,
             'batches_processed': 0,
-            'start_time': None,
-            'end_time': None,
+            'start_time_mono': None,
+            'end_time_mono': None,
             'errors': []
         }
         
         logger.info(f"Initialized S3VectorsInserter for bucket: {vector_bucket_name}, index: {index_name}")
 
-    def load_embedding_file(self, file_path: str) -> Dict[str, Any]:
+    @staticmethod
+    def load_embedding_file(file_path: str) -> Dict[str, Any]:
         """Load a single embedding file."""
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            return data
+            return orjson.loads(Path(file_path).read_bytes())
         except Exception as e:
             logger.error(f"Error loading file {file_path}: {str(e)}")
             return None
 
-    def prepare_vector_for_s3(self, embedding_data: Dict[str, Any]) -> Dict[str, Any]:
+    @staticmethod
+    def prepare_vector_for_s3(embedding_data: Dict[str, Any]) -> Dict[str, Any]:
         """Prepare embedding data for S3 Vectors format."""
         try:
-            # Extract the embedding vector
+            # Extract the embedding vector; iter_embedding_records always yields lists
             embedding = embedding_data.get('embedding', [])
             
-            # Ensure it's float32 format
-            if isinstance(embedding, list):
-                embedding = np.array(embedding, dtype=np.float32).tolist()
-            
             # Extract metadata
             metadata = embedding_data.get('metadata', {})
-            content = embedding_data.get('content', '')
+            
+            # Newer embedding files carry the preview precomputed; only older ones need the content
+            content_preview = embedding_data.get('content_preview')
+            if content_preview is not None:
+                content_length = embedding_data.get('content_length', 0)
+            else:
+                content = embedding_data.get('content', '')
+                content_preview = content[:200] if content else ''  # First 200 chars for preview
+                content_length = len(content) if content else 0
             
             # Create comprehensive metadata for filtering
             vector_metadata = {
@@ -91,8 +140,8 @@ class S3VectorsInserter:
                 'token_count': metadata.get('token_count', 0),
                 'timestamp': metadata.get('timestamp', ''),
                 'source_file': metadata.get('source_file', ''),
-                'content_preview': content[:200] if content else '',  # First 200 chars for preview
-                'content_length': len(content) if content else 0
+                'content_preview': content_preview,
+                'content_length': content_length
             }
             
             # Generate unique key from chunk_id or create one
@@ -117,79 +166,195 @@ class S3VectorsInserter:
             return None
 
     def insert_vectors_batch(self, vectors: List[Dict[str, Any]]) -> bool:
-        """Insert a batch of vectors into S3 Vectors."""
-        try:
-            logger.info(f"Inserting batch of {len(vectors)} vectors...")
-            
-            response = self.s3vectors_client.put_vectors(
-                vectorBucketName=self.vector_bucket_name,
-                indexName=self.index_name,
-                vectors=vectors
-            )
+        """Insert a batch of vectors into S3 Vectors, backing off and retrying when throttled."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                logger.info(f"Inserting batch of {len(vectors)} vectors...")
+                
+                response = self.s3vectors_client.put_vectors(
+                    vectorBucketName=self.vector_bucket_name,
+                    indexName=self.index_name,
+                    vectors=vectors
+                )
+                
+                logger.info(f"Successfully inserted batch of {len(vectors)} vectors")
+                with self.stats_lock:
+                    self.stats['successful_insertions'] += len(vectors)
+                    self.stats['batches_processed'] += 1
+                
+                return True
+                
+            except Exception as e:
+                error_code = e.response.get('Error', {}).get('Code') if isinstance(e, ClientError) else None
+                if error_code in RETRYABLE_ERROR_CODES and attempt < self.max_retries:
+                    delay = min(30.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.0)
+                    logger.warning(f"Batch throttled ({error_code}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                    continue
+                
+                logger.error(f"Error inserting batch: {str(e)}")
+                with self.stats_lock:
+                    self.stats['failed_insertions'] += len(vectors)
+                    self.stats['errors'].append(str(e))
+                return False
+
+    @staticmethod
+    def find_shard_paths(embeddings_dir: str) -> List[str]:
+        """Return the embeddings-*.jsonl.gz shard paths in the directory, in order."""
+        return sorted(
+            entry.path for entry in os.scandir(embeddings_dir)
+            if entry.name.startswith(EMBEDDINGS_SHARD_PREFIX) and entry.name.endswith(EMBEDDINGS_SHARD_SUFFIX)
+        )
+
+    def iter_embedding_records(self, embeddings_dir: str) -> Iterator[Dict[str, Any]]:
+        """Yield embedding records from the directory, setting stats['total_embeddings'].
+        
+        Reads the embeddings.npy matrix (memory-mapped) with its metadata sidecar when
+        present, then embeddings-*.jsonl.gz shards, otherwise streams the individual
+        *_embedding.json files.
+        """
+        matrix_path = os.path.join(embeddings_dir, EMBEDDINGS_MATRIX_FILE)
+        if os.path.exists(matrix_path):
+            embeddings = np.load(matrix_path, mmap_mode='r')
+            records = orjson.loads(Path(embeddings_dir, EMBEDDINGS_METADATA_FILE).read_bytes())
             
-            logger.info(f"Successfully inserted batch of {len(vectors)} vectors")
-            self.stats['successful_insertions'] += len(vectors)
-            self.stats['batches_processed'] += 1
+            self.stats['total_embeddings'] = len(records)
+            logger.info(f"Found embedding matrix with {len(records)} rows to process")
             
-            return True
+            # Rows of the memory-mapped matrix become lists only here, as they are consumed
+            for record, embedding in zip(records, embeddings):
+                record['embedding'] = embedding.tolist()
+                yield record
+            return
+        
+        shard_paths = self.find_shard_paths(embeddings_dir)
+        if shard_paths:
+            # Sequential read of each compressed shard, one record per line
+            self.stats['total_embeddings'] = 0
+            for shard_path in shard_paths:
+                with gzip.open(shard_path, 'rb') as shard:
+                    for line in shard:
+                        self.stats['total_embeddings'] += 1
+                        yield orjson.loads(line)
             
-        except Exception as e:
-            logger.error(f"Error inserting batch: {str(e)}")
-            self.stats['failed_insertions'] += len(vectors)
-            self.stats['errors'].append(str(e))
-            return False
+            logger.info(f"Read {self.stats['total_embeddings']} embeddings from {len(shard_paths)} shards")
+            return
+        
+        # Stream embedding files straight from the directory scan; the total is
+        # counted as files are found
+        self.stats['total_embeddings'] = 0
+        with os.scandir(embeddings_dir) as entries:
+            for entry in entries:
+                if not (entry.name.endswith('_embedding.json') and entry.is_file()):
+                    continue
+                self.stats['total_embeddings'] += 1
+                
+                # Load embedding data
+                embedding_data = self.load_embedding_file(entry.path)
+                if embedding_data:
+                    yield embedding_data
+        
+        logger.info(f"Found {self.stats['total_embeddings']} embedding files")
 
-    def process_embeddings_directory(self, embeddings_dir: str, batch_size: int = 25):
-        """Process all embedding files in the directory."""
-        self.stats['start_time'] = datetime.now()
+    def iter_vector_records(self, embeddings_dir: str) -> Iterator[Dict[str, Any]]:
+        """Yield vector records ready for put_vectors, setting stats['total_embeddings'].
+        
+        Individual *_embedding.json files are decoded and prepared across a process
+        pool, since JSON parsing dominates there; matrix and shard input is prepared
+        inline as it is read.
+        """
+        has_packed_input = (os.path.exists(os.path.join(embeddings_dir, EMBEDDINGS_MATRIX_FILE))
+                            or self.find_shard_paths(embeddings_dir))
+        if has_packed_input or self.parse_processes == 1:
+            for embedding_data in self.iter_embedding_records(embeddings_dir):
+                vector_record = self.prepare_vector_for_s3(embedding_data)
+                if vector_record:
+                    yield vector_record
+            return
         
-        # Get all embedding files
-        embedding_files = [
-            f for f in os.listdir(embeddings_dir) 
-            if f.endswith('_embedding.json')
+        file_paths = [
+            entry.path for entry in os.scandir(embeddings_dir)
+            if entry.name.endswith('_embedding.json') and entry.is_file()
         ]
+        self.stats['total_embeddings'] = len(file_paths)
+        logger.info(f"Found {len(file_paths)} embedding files")
         
-        self.stats['total_embeddings'] = len(embedding_files)
-        logger.info(f"Found {len(embedding_files)} embedding files to process")
+        # Records arrive in completion order. Only a sliding window of batches is
+        # submitted, so the pool stops parsing while the consumer is blocked
+        max_in_flight = PARSE_BATCHES_IN_FLIGHT_PER_PROCESS * (self.parse_processes or os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=self.parse_processes) as pool:
+            in_flight = set()
+            for start in range(0, len(file_paths), PARSE_BATCH_SIZE):
+                in_flight.add(pool.submit(prepare_batch, file_paths[start:start + PARSE_BATCH_SIZE]))
+                if len(in_flight) >= max_in_flight:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from filter(None, future.result())
+            
+            for future in as_completed(in_flight):
+                yield from filter(None, future.result())
+
+    def insert_vectors_stream(self, vector_records: Iterable[Dict[str, Any]], batch_size: int = 25) -> int:
+        """Insert vector records from any iterable, returning how many were queued.
         
-        # Process files in batches
-        vectors_batch = []
+        max_concurrent_batches worker threads drain a bounded queue into batches of
+        batch_size; records that failed preparation (None) are skipped.
+        """
+        self.stats['start_time_mono'] = time.monotonic()
         
-        for i, filename in enumerate(embedding_files):
-            file_path = os.path.join(embeddings_dir, filename)
-            
-            # Load embedding data
-            embedding_data = self.load_embedding_file(file_path)
-            if not embedding_data:
-                continue
-            
-            # Prepare vector for S3
-            vector_record = self.prepare_vector_for_s3(embedding_data)
-            if not vector_record:
-                continue
-            
-            vectors_batch.append(vector_record)
-            
-            # Insert batch when it reaches batch_size or is the last file
-            if len(vectors_batch) >= batch_size or i == len(embedding_files) - 1:
-                success = self.insert_vectors_batch(vectors_batch)
-                
-                if success:
-                    logger.info(f"Progress: {i + 1}/{len(embedding_files)} files processed")
-                else:
-                    logger.error(f"Failed to insert batch at file {i + 1}")
+        # Bounded hand-off between the reader (this thread) and the uploaders: put()
+        # blocks once the uploaders fall behind, so memory stays flat at any dataset size
+        vector_queue = queue.Queue(maxsize=4 * batch_size * self.max_concurrent_batches)
+        
+        def upload_worker():
+            vectors_batch = []
+            while True:
+                vector_record = vector_queue.get()
+                if vector_record is END_OF_STREAM:
+                    break
+                vectors_batch.append(vector_record)
                 
-                vectors_batch = []  # Reset batch
+                # Insert batch when it reaches batch_size
+                if len(vectors_batch) >= batch_size:
+                    self.insert_vectors_batch(vectors_batch)
+                    vectors_batch = []  # Reset batch
+            
+            # Insert the remaining partial batch
+            if vectors_batch:
+                self.insert_vectors_batch(vectors_batch)
+        
+        workers = [threading.Thread(target=upload_worker, daemon=True) for _ in range(self.max_concurrent_batches)]
+        for worker in workers:
+            worker.start()
+        
+        records_queued = 0
+        try:
+            for vector_record in vector_records:
+                if not vector_record:
+                    continue
                 
-                # Small delay to avoid rate limiting
-                time.sleep(0.1)
+                vector_queue.put(vector_record)
+                records_queued += 1
+                if records_queued % batch_size == 0:
+                    logger.info(f"Progress: {records_queued} embeddings queued for insertion")
+        finally:
+            # One end marker per worker; each flushes its partial batch and exits
+            for _ in workers:
+                vector_queue.put(END_OF_STREAM)
+            for worker in workers:
+                worker.join()
         
-        self.stats['end_time'] = datetime.now()
+        self.stats['end_time_mono'] = time.monotonic()
+        return records_queued
+
+    def process_embeddings_directory(self, embeddings_dir: str, batch_size: int = 25):
+        """Process all embedding files in the directory."""
+        self.insert_vectors_stream(self.iter_vector_records(embeddings_dir), batch_size)
         self.print_final_statistics()
 
     def print_final_statistics(self):
         """Print comprehensive statistics."""
-        duration = self.stats['end_time'] - self.stats['start_time']
+        duration = self.stats['end_time_mono'] - self.stats['start_time_mono']
         
         print("\n" + "="*60)
         print("🎯 S3 VECTORS INSERTION COMPLETE")
@@ -198,7 +363,7 @@ class S3VectorsInserter:
         print(f"✅ Successful Insertions: {self.stats['successful_insertions']}")
         print(f"❌ Failed Insertions: {self.stats['failed_insertions']}")
         print(f"📦 Batches Processed: {self.stats['batches_processed']}")
-        print(f"⏱️  Total Duration: {duration}")
+        print(f"⏱️  Total Duration: {duration:.1f}s")
         print(f"🏆 Success Rate: {(self.stats['successful_insertions']/self.stats['total_embeddings']*100):.1f}%")
         
         if self.stats['errors']:
@@ -216,6 +381,17 @@ class S3VectorsInserter:
         print("\n🚀 Ready for Semantic Search!")
         print("="*60)
 
+def prepare_one(file_path: str) -> Dict[str, Any]:
+    """Load one embedding file and prepare its vector record."""
+    embedding_data = S3VectorsInserter.load_embedding_file(file_path)
+    if not embedding_data:
+        return None
+    return S3VectorsInserter.prepare_vector_for_s3(embedding_data)
+
+def prepare_batch(file_paths: List[str]) -> List[Dict[str, Any]]:
+    """Prepare vector records for a batch of embedding files (runs in a worker process)."""
+    return [prepare_one(file_path) for file_path in file_paths]
+
 def main():
     """Main execution function."""
     # Configuration
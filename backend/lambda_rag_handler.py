@@ -5,20 +5,154 @@ AWS Documentation RAG System - Lambda Handler
 Lambda function to handle RAG queries from the React UI.
 Provides API endpoints for:
 - /ask - Process user questions
+- /ask_batch - Process several questions in one request
 - /examples - Get example questions
 - /health - Health check
 """
 
-import json
+import orjson
 import boto3
+from botocore.config import Config
+import functools
+import hashlib
 import logging
+import os
 import time
-from typing import List, Dict, Any
-from datetime import datetime
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import List, Dict, Any, Iterator, Optional
+
+try:
+    # SnapStart runtime hooks, only available inside the Lambda Python runtime
+    from snapshot_restore_py import register_after_restore
+except ImportError:
+    register_after_restore = None
 
 # Configure logging
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
+# Lambda's stdout goes to CloudWatch Logs, so production defaults to WARNING;
+# set LOG_LEVEL=INFO (or DEBUG) to trace requests
+logger.setLevel(os.environ.get('LOG_LEVEL', 'WARNING').upper())
+
+# Bedrock inference latency mode for Claude. Only a few model/region pairs offer
+# "optimized" (Bedrock rejects it for Claude 3.5 Sonnet in us-east-1), so it is opt-in
+CLAUDE_LATENCY_MODE = os.environ.get('CLAUDE_LATENCY_MODE', 'standard')
+
+# Upper bound on Claude's answer length; the structured answer format rarely needs more
+MAX_ANSWER_TOKENS = 2000
+
+# ISO 8601 UTC timestamps in responses, formatted with time.strftime
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# Claude prompt scaffold, built once at import; filled with str.format per request
+PROMPT_TEMPLATE = """You are an expert AWS solutions architect and documentation assistant. A user has asked a question about AWS services, and I've retrieved the most relevant documentation sections using semantic search.
+
+**User Question:** {user_question}
+
+**Retrieved AWS Documentation Context:**
+{context}
+
+**Instructions:**
+1. Provide a comprehensive, accurate answer to the user's question based on the retrieved documentation
+2. Structure your response with clear headings and bullet points where appropriate
+3. Include specific AWS service names, features, and best practices mentioned in the context
+4. If the context doesn't fully answer the question, acknowledge what information is available and what might be missing
+5. Provide actionable recommendations and next steps where relevant
+6. At the end, include a "Sources" section referencing which retrieved documents you used
+7. Suggest 2-3 related follow-up questions the user might want to ask
+
+**Response Format:**
+## Answer
+
+[Your comprehensive answer here]
+
+## Key Points
+- [Important point 1]
+- [Important point 2]
+- [Important point 3]
+
+## Recommendations
+- [Actionable recommendation 1]
+- [Actionable recommendation 2]
+
+## Sources
+- Source 1: [Service Name] - [Document Type] (Similarity: X%)
+- Source 2: [Service Name] - [Document Type] (Similarity: X%)
+
+## Related Questions You Might Ask
+1. [Related question 1]
+2. [Related question 2]
+3. [Related question 3]
+
+Please provide a helpful, accurate, and well-structured response based on the AWS documentation context provided."""
+
+# Retrieved documents whose preview SimHashes differ in at most this many bits are duplicates
+SIMHASH_MAX_DISTANCE = 3
+
+# One retrieved document in the prompt context
+SOURCE_TEMPLATE = "\n**Source {rank}** (Similarity: {sim}%)\nService: {svc}\nType: {typ}\nContent: {prev}\n"
+
+# Most questions accepted by one /ask_batch request
+MAX_BATCH_QUESTIONS = 10
+
+# Worker pool for independent AWS calls, created once per Lambda container and
+# reused by warm invocations (boto3 clients are thread-safe)
+executor = ThreadPoolExecutor(max_workers=8)
+
+# One boto3 session per container so every client shares its resolved credentials,
+# and one client config so pooled connections stay open across warm invocations
+boto_session = boto3.session.Session()
+client_config = Config(
+    max_pool_connections=50,
+    tcp_keepalive=True,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
+@dataclass
+class Step:
+    """One tracked execution step"""
+    # Explicit slots (dataclass(slots=True) needs Python 3.10) keep entries compact
+    __slots__ = ('step', 'description', 'timestamp', 'duration_from_start', 'status')
+    
+    step: str
+    description: str
+    timestamp: float
+    duration_from_start: float
+    status: str
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "step": self.step,
+            "description": self.description,
+            "timestamp": self.timestamp,
+            "duration_from_start": self.duration_from_start,
+            "status": self.status
+        }
+
+@dataclass
+class ApiCall:
+    """One tracked AWS API call"""
+    __slots__ = ('service', 'operation', 'timestamp', 'duration_from_start', 'details')
+    
+    service: str
+    operation: str
+    timestamp: float
+    duration_from_start: float
+    details: Dict[str, Any]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "service": self.service,
+            "operation": self.operation,
+            "timestamp": self.timestamp,
+            "duration_from_start": self.duration_from_start,
+            "details": self.details
+        }
+
+def format_timestamp(epoch_seconds: Optional[float] = None) -> str:
+    """Format a Unix time (default now) as an ISO 8601 UTC timestamp."""
+    return time.strftime(TIMESTAMP_FORMAT, time.gmtime(epoch_seconds))
 
 class ExecutionTracker:
     """Track execution steps and AWS API calls for transparency."""
@@ -26,35 +160,25 @@ class ExecutionTracker:
     def __init__(self):
         self.steps = []
         self.api_calls = []
-        self.start_time = time.time()
+        # Monotonic clock: step and API call timestamps are seconds on this clock
+        self.start_time = time.monotonic()
+        # Wall clock is read once and only formatted at the response boundary
+        self.wall_start = time.time()
         self.metrics = {}
     
     def add_step(self, step_name: str, description: str = ""):
         """Add an execution step with timestamp."""
-        current_time = time.time()
-        duration = current_time - self.start_time
-        
-        step = {
-            "step": step_name,
-            "description": description,
-            "timestamp": current_time,
-            "duration_from_start": round(duration, 3),
-            "status": "completed"
-        }
-        self.steps.append(step)
-        logger.info(f"Step: {step_name} - {description} ({duration:.3f}s)")
+        now = time.monotonic()
+        duration = now - self.start_time
+        
+        self.steps.append(Step(step_name, description, now, round(duration, 3), "completed"))
+        logger.info("Step: %s - %s (%.3fs)", step_name, description, duration)
     
     def add_api_call(self, service: str, operation: str, details: Dict = None):
         """Track AWS API calls with exact details."""
-        api_call = {
-            "service": service,
-            "operation": operation,
-            "timestamp": time.time(),
-            "duration_from_start": round(time.time() - self.start_time, 3),
-            "details": details or {}
-        }
-        self.api_calls.append(api_call)
-        logger.info(f"AWS API: {service}:{operation} - {details}")
+        now = time.monotonic()
+        self.api_calls.append(ApiCall(service, operation, now, round(now - self.start_time, 3), details or {}))
+        logger.info("AWS API: %s:%s - %s", service, operation, details)
     
     def add_metric(self, key: str, value: Any):
         """Add performance metrics."""
@@ -62,68 +186,189 @@ class ExecutionTracker:
     
     def get_summary(self):
         """Get complete execution summary."""
-        total_duration = time.time() - self.start_time
+        total_duration = time.monotonic() - self.start_time
         return {
             "total_duration": round(total_duration, 3),
-            "steps": self.steps,
-            "api_calls": self.api_calls,
+            "steps": [step.to_dict() for step in self.steps],
+            "api_calls": [api_call.to_dict() for api_call in self.api_calls],
             "metrics": self.metrics,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": format_timestamp(self.wall_start + total_duration)
         }
 
+@functools.lru_cache(maxsize=1024)
+def fetch_titan_embedding(titan_client, query_text: str, model_id: str, dimensions: int) -> np.ndarray:
+    """Call Titan Text Embeddings V2, caching results per warm container.
+    
+    Returns a read-only float32 array so cached embeddings cannot be mutated by callers.
+    """
+    body = orjson.dumps({
+        "inputText": query_text,
+        "dimensions": dimensions,
+        "normalize": True,
+        "embeddingTypes": ["float"]
+    })
+    
+    response = titan_client.invoke_model(
+        body=body,
+        modelId=model_id,
+        accept="application/json",
+        contentType="application/json"
+    )
+    
+    response_body = orjson.loads(response["body"].read())
+    embedding = np.asarray(response_body["embedding"], dtype=np.float32)
+    embedding.flags.writeable = False
+    return embedding
+
+@functools.lru_cache(maxsize=None)
+def get_token_encoding():
+    """Load the cl100k_base tokenizer on first use, keeping tiktoken off the cold start."""
+    import tiktoken
+    return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str) -> Optional[int]:
+    """Count tokens with cl100k_base, a close approximation of Claude's tokenizer.
+    
+    Returns None if the tokenizer cannot be loaded; the counts are diagnostics only.
+    """
+    try:
+        return len(get_token_encoding().encode(text, disallowed_special=()))
+    except Exception as e:
+        logger.debug("Token counting unavailable: %s", e)
+        return None
+
+def simhash64(text: str) -> int:
+    """64-bit SimHash of the text's lowercased words; similar texts differ in few bits."""
+    words = text.lower().split()
+    if not words:
+        return 0
+    hashes = np.array([int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+                       for word in words], dtype=np.uint64)
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    # Each bit is set when most words have it set
+    majority = bits.sum(axis=0) * 2 > len(words)
+    return int(np.packbits(majority, bitorder='little').view('<u8')[0])
+
+class SemanticCache:
+    """Recent S3 Vectors results keyed by query embedding, matched by cosine similarity.
+    
+    Titan embeddings are normalized, so one matrix-vector product scores the query
+    against every cached embedding. The least recently used entry is evicted when full.
+    """
+    
+    def __init__(self, capacity: int = 256, threshold: float = 0.95, dimensions: int = 1024):
+        self.threshold = threshold
+        self.embeddings = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.top_ks = np.zeros(capacity, dtype=np.int64)
+        self.entries = [None] * capacity  # vectors per row
+        self.last_used = np.full(capacity, -np.inf)
+        self.size = 0
+    
+    def lookup(self, query_embedding: np.ndarray, top_k: int) -> Optional[List[Dict[str, Any]]]:
+        """Return cached results for a near-identical query, or None."""
+        if self.size == 0:
+            return None
+        similarities = self.embeddings[:self.size] @ query_embedding
+        # Only rows cached for the same top_k can answer, so exclude the rest from the argmax
+        similarities[self.top_ks[:self.size] != top_k] = -np.inf
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        self.last_used[best] = time.monotonic()
+        return self.entries[best]
+    
+    def store(self, query_embedding: np.ndarray, top_k: int, vectors: List[Dict[str, Any]]):
+        """Cache results, replacing the least recently used entry when full."""
+        if self.size < len(self.entries):
+            slot = self.size
+            self.size += 1
+        else:
+            slot = int(np.argmin(self.last_used))
+        self.embeddings[slot] = query_embedding
+        self.top_ks[slot] = top_k
+        self.entries[slot] = vectors
+        self.last_used[slot] = time.monotonic()
+
 class AWSDocsRAGSystem:
     def __init__(self, 
                  vector_bucket_name: str, 
                  index_name: str, 
                  s3vectors_region: str = "us-east-1",
-                 bedrock_region: str = "us-east-1"):
+                 bedrock_region: str = "us-east-1",
+                 extra_index_names: Optional[List[str]] = None):
         """Initialize the AWS Documentation RAG System."""
         
         self.vector_bucket_name = vector_bucket_name
         self.index_name = index_name
+        # Every index searched per question; more than one fans out in parallel
+        self.index_names = [index_name] + list(extra_index_names or [])
         self.s3vectors_region = s3vectors_region
         self.bedrock_region = bedrock_region
         
-        # Initialize AWS clients
-        self.s3vectors_client = boto3.client('s3vectors', region_name=s3vectors_region)
-        self.bedrock_client = boto3.client('bedrock-runtime', region_name=bedrock_region)
+        self.connect()
         
         # Model configurations
         self.embedding_model = "amazon.titan-embed-text-v2:0"
         self.llm_model = "anthropic.claude-3-5-sonnet-20240620-v1:0"
         
-        logger.info(f"Initialized RAG System for Lambda")
+        # Paraphrased questions reuse earlier search results instead of querying S3 Vectors
+        self.semantic_cache = SemanticCache()
+        
+        logger.info("Initialized RAG System for Lambda")
+
+    def connect(self):
+        """Create the AWS clients (with empty connection pools) from the shared session and config."""
+        self.s3vectors_client = boto_session.client('s3vectors', region_name=self.s3vectors_region, config=client_config)
+        self.bedrock_client = boto_session.client('bedrock-runtime', region_name=self.bedrock_region, config=client_config)
+        # Use us-west-2 for Titan embeddings (where it's available)
+        self.titan_client = boto_session.client('bedrock-runtime', region_name='us-west-2', config=client_config)
+        # Cached embeddings are keyed by client, so entries for replaced clients are unreachable
+        fetch_titan_embedding.cache_clear()
 
-    def generate_query_embedding(self, query_text: str) -> List[float]:
+    def generate_query_embedding(self, query_text: str, tracker: ExecutionTracker = None) -> Optional[np.ndarray]:
         """Generate embedding for query text using Titan Text Embeddings V2."""
         try:
-            # Use us-west-2 for Titan embeddings (where it's available)
-            titan_client = boto3.client('bedrock-runtime', region_name='us-west-2')
-            
-            body = json.dumps({
-                "inputText": query_text,
-                "dimensions": 1024,
-                "normalize": True,
-                "embeddingTypes": ["float"]
-            })
-            
-            response = titan_client.invoke_model(
-                body=body,
-                modelId=self.embedding_model,
-                accept="application/json",
-                contentType="application/json"
-            )
-            
-            response_body = json.loads(response["body"].read())
-            embedding = response_body["embedding"]
+            # Repeated questions are served from the module-level cache without calling Bedrock
+            hits_before = fetch_titan_embedding.cache_info().hits
+            embedding = fetch_titan_embedding(self.titan_client, query_text, self.embedding_model, 1024)
+            if tracker:
+                tracker.add_metric("embedding_cache_hit", fetch_titan_embedding.cache_info().hits > hits_before)
             
-            logger.info(f"Generated embedding for query: '{query_text[:50]}...'")
+            logger.info("Generated embedding for query: '%s...'", query_text[:50])
             return embedding
             
         except Exception as e:
-            logger.error(f"Error generating query embedding: {str(e)}")
+            logger.error("Error generating query embedding: %s", e)
             return None
 
+    def query_index(self, index_name: str, query_embedding: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """Run QueryVectors against one index."""
+        response = self.s3vectors_client.query_vectors(
+            vectorBucketName=self.vector_bucket_name,
+            indexName=index_name,
+            # boto3 only accepts a list here, so convert at the API boundary
+            queryVector={'float32': query_embedding.tolist()},
+            topK=top_k,
+            returnDistance=True,
+            returnMetadata=True
+        )
+        return response.get('vectors', [])
+
+    def query_indexes(self, query_embedding: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """Query every configured index concurrently and keep the top_k closest matches overall."""
+        if len(self.index_names) == 1:
+            return self.query_index(self.index_name, query_embedding, top_k)
+        
+        futures = [executor.submit(self.query_index, index_name, query_embedding, top_k)
+                   for index_name in self.index_names]
+        return self.merge_index_results([future.result() for future in as_completed(futures)], top_k)
+
+    def merge_index_results(self, index_results: List[List[Dict[str, Any]]], top_k: int) -> List[Dict[str, Any]]:
+        """Combine per-index matches into the top_k closest overall."""
+        vectors = [vector for result in index_results for vector in result]
+        vectors.sort(key=lambda vector: vector.get('distance', 1.0))
+        return vectors[:top_k]
+
     def search_relevant_docs(self, query_text: str, top_k: int = 5, tracker: ExecutionTracker = None) -> List[Dict[str, Any]]:
         """Search for relevant documentation using S3 Vectors."""
         try:
@@ -140,32 +385,29 @@ class AWSDocsRAGSystem:
                     "embedding_dimensions": 1024
                 })
             
-            query_embedding = self.generate_query_embedding(query_text)
-            if not query_embedding:
+            query_embedding = self.generate_query_embedding(query_text, tracker)
+            if query_embedding is None:
                 return []
             
+            vectors = self.semantic_cache.lookup(query_embedding, top_k)
             if tracker:
-                tracker.add_step("vector_search", f"Searching S3 Vectors index for top {top_k} matches")
-                tracker.add_api_call("s3vectors", "QueryVectors", {
-                    "bucket": self.vector_bucket_name,
-                    "index": self.index_name,
-                    "region": self.s3vectors_region,
-                    "top_k": top_k,
-                    "vector_dimensions": len(query_embedding)
-                })
+                tracker.add_metric("semantic_cache_hit", vectors is not None)
             
-            # Search vectors
-            response = self.s3vectors_client.query_vectors(
-                vectorBucketName=self.vector_bucket_name,
-                indexName=self.index_name,
-                queryVector={'float32': query_embedding},
-                topK=top_k,
-                returnDistance=True,
-                returnMetadata=True
-            )
-            
-            vectors = response.get('vectors', [])
-            logger.info(f"Found {len(vectors)} relevant documents")
+            if vectors is None:
+                if tracker:
+                    tracker.add_step("vector_search", f"Searching S3 Vectors index for top {top_k} matches")
+                    tracker.add_api_call("s3vectors", "QueryVectors", {
+                        "bucket": self.vector_bucket_name,
+                        "index": self.index_name,
+                        "region": self.s3vectors_region,
+                        "top_k": top_k,
+                        "vector_dimensions": len(query_embedding)
+                    })
+                
+                # Search vectors
+                vectors = self.query_indexes(query_embedding, top_k)
+                self.semantic_cache.store(query_embedding, top_k, vectors)
+            logger.info("Found %s relevant documents", len(vectors))
             
             if tracker:
                 tracker.add_step("document_retrieval", f"Retrieved {len(vectors)} relevant documents")
@@ -178,111 +420,143 @@ class AWSDocsRAGSystem:
                 tracker.add_metric("documents_found", len(vectors))
                 tracker.add_metric("query_vector_dimensions", len(query_embedding))
             
-            # Process and enrich results
-            processed_results = []
-            for i, vector in enumerate(vectors, 1):
-                metadata = vector.get('metadata', {})
-                distance = vector.get('distance', 1.0)
-                similarity = (1 - distance) * 100
-                
-                processed_result = {
-                    'rank': i,
-                    'key': vector.get('key', 'unknown'),
-                    'similarity_score': round(similarity, 1),
-                    'service_name': metadata.get('service_name', 'Unknown'),
-                    'document_type': metadata.get('document_type', 'documentation'),
-                    'content_preview': metadata.get('content_preview', ''),
-                    'content_length': metadata.get('content_length', 0),
-                    'source_file': metadata.get('source_file', ''),
-                    'raw_distance': distance
-                }
-                processed_results.append(processed_result)
-            
-            return processed_results
+            return self.process_vectors(vectors)
             
         except Exception as e:
-            logger.error(f"Error searching documents: {str(e)}")
+            logger.error("Error searching documents: %s", e)
             return []
 
+    def search_relevant_docs_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict[str, Any]]]:
+        """Search for several queries at once, returning one result list per query.
+        
+        Titan has no multi-text endpoint and QueryVectors takes one query vector per
+        call, so the embeddings and then the searches each fan out on the worker pool.
+        """
+        embeddings = list(executor.map(self.generate_query_embedding, queries))
+        
+        vectors_per_query = [[] for _ in queries]
+        futures = {}
+        for i, query_embedding in enumerate(embeddings):
+            if query_embedding is None:
+                continue
+            cached_vectors = self.semantic_cache.lookup(query_embedding, top_k)
+            if cached_vectors is not None:
+                vectors_per_query[i] = cached_vectors
+                continue
+            for index_name in self.index_names:
+                futures[executor.submit(self.query_index, index_name, query_embedding, top_k)] = i
+        
+        index_results = {}
+        failed = set()
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                index_results.setdefault(i, []).append(future.result())
+            except Exception as e:
+                logger.error("Error searching documents: %s", e)
+                failed.add(i)
+        
+        for i, results in index_results.items():
+            if i in failed:
+                continue
+            vectors_per_query[i] = self.merge_index_results(results, top_k)
+            self.semantic_cache.store(embeddings[i], top_k, vectors_per_query[i])
+        
+        return [self.process_vectors(vectors) for vectors in vectors_per_query]
+
+    def process_vectors(self, vectors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Turn QueryVectors matches into ranked source entries."""
+        # Convert all distances to similarity percentages in one vectorized pass
+        distances = np.fromiter((vector.get('distance', 1.0) for vector in vectors),
+                                dtype=np.float64, count=len(vectors))
+        similarities = np.round((1.0 - distances) * 100.0, 1)
+        
+        # Process and enrich results
+        processed_results = []
+        for i, (vector, similarity, distance) in enumerate(
+                zip(vectors, similarities.tolist(), distances.tolist()), 1):
+            metadata = vector.get('metadata', {})
+            
+            processed_result = {
+                'rank': i,
+                'key': vector.get('key', 'unknown'),
+                'similarity_score': similarity,
+                'service_name': metadata.get('service_name', 'Unknown'),
+                'document_type': metadata.get('document_type', 'documentation'),
+                'content_preview': metadata.get('content_preview', ''),
+                'content_length': metadata.get('content_length', 0),
+                'source_file': metadata.get('source_file', ''),
+                'raw_distance': distance
+            }
+            processed_results.append(processed_result)
+        
+        return processed_results
+
+    def dedupe_docs(self, relevant_docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Drop retrieved documents that would repeat context already in the prompt.
+        
+        Keeps the best-ranked document per source file, then skips any whose content
+        preview is a near-duplicate (SimHash within SIMHASH_MAX_DISTANCE bits) of one kept.
+        """
+        kept = []
+        kept_hashes = []
+        seen_sources = set()
+        for doc in relevant_docs:  # Already ordered by similarity
+            source_file = doc['source_file']
+            if source_file and source_file in seen_sources:
+                continue
+            fingerprint = simhash64(doc['content_preview'])
+            if any(bin(fingerprint ^ kept_hash).count('1') <= SIMHASH_MAX_DISTANCE for kept_hash in kept_hashes):
+                continue
+            seen_sources.add(source_file)
+            kept_hashes.append(fingerprint)
+            kept.append(doc)
+        return kept
+
     def generate_rag_response(self, user_question: str, relevant_docs: List[Dict[str, Any]], tracker: ExecutionTracker = None) -> str:
         """Generate comprehensive response using Claude 3.5 Sonnet with retrieved context."""
         try:
+            # Near-duplicate sources only add prompt tokens, so Claude sees one of each
+            context_docs = self.dedupe_docs(relevant_docs)
+            
             if tracker:
-                tracker.add_step("context_assembly", f"Assembling context from {len(relevant_docs)} documents")
+                tracker.add_step("context_assembly", f"Assembling context from {len(context_docs)} documents")
             
             # Prepare context from retrieved documents
-            context_parts = []
-            for doc in relevant_docs:
-                context_parts.append(f"""
-**Source {doc['rank']}** (Similarity: {doc['similarity_score']}%)
-Service: {doc['service_name']}
-Type: {doc['document_type']}
-Content: {doc['content_preview']}
-""")
-            
-            context = "\n".join(context_parts)
+            context = "\n".join(
+                SOURCE_TEMPLATE.format(
+                    rank=doc['rank'],
+                    sim=doc['similarity_score'],
+                    svc=doc['service_name'],
+                    typ=doc['document_type'],
+                    prev=doc['content_preview']
+                )
+                for doc in context_docs
+            )
             
             # Create comprehensive prompt for Claude
-            prompt = f"""You are an expert AWS solutions architect and documentation assistant. A user has asked a question about AWS services, and I've retrieved the most relevant documentation sections using semantic search.
-
-**User Question:** {user_question}
-
-**Retrieved AWS Documentation Context:**
-{context}
-
-**Instructions:**
-1. Provide a comprehensive, accurate answer to the user's question based on the retrieved documentation
-2. Structure your response with clear headings and bullet points where appropriate
-3. Include specific AWS service names, features, and best practices mentioned in the context
-4. If the context doesn't fully answer the question, acknowledge what information is available and what might be missing
-5. Provide actionable recommendations and next steps where relevant
-6. At the end, include a "Sources" section referencing which retrieved documents you used
-7. Suggest 2-3 related follow-up questions the user might want to ask
-
-**Response Format:**
-## Answer
-
-[Your comprehensive answer here]
-
-## Key Points
-- [Important point 1]
-- [Important point 2]
-- [Important point 3]
-
-## Recommendations
-- [Actionable recommendation 1]
-- [Actionable recommendation 2]
-
-## Sources
-- Source 1: [Service Name] - [Document Type] (Similarity: X%)
-- Source 2: [Service Name] - [Document Type] (Similarity: X%)
-
-## Related Questions You Might Ask
-1. [Related question 1]
-2. [Related question 2]
-3. [Related question 3]
+            prompt = PROMPT_TEMPLATE.format(user_question=user_question, context=context)
 
-Please provide a helpful, accurate, and well-structured response based on the AWS documentation context provided."""
-
-            # Calculate token counts for tracking
-            input_tokens = len(prompt.split()) * 1.3  # Rough estimate
+            # Token counts are diagnostics only, so they are computed just for debug logging
+            count_tokens_enabled = tracker is not None and logger.isEnabledFor(logging.DEBUG)
             
             if tracker:
                 tracker.add_step("claude_generation", "Generating comprehensive answer with Claude 3.5 Sonnet")
-                tracker.add_api_call("bedrock-runtime", "InvokeModel", {
+                tracker.add_api_call("bedrock-runtime", "InvokeModelWithResponseStream", {
                     "model": "anthropic.claude-3-5-sonnet-20240620-v1:0",
                     "region": self.bedrock_region,
-                    "max_tokens": 4000,
+                    "max_tokens": MAX_ANSWER_TOKENS,
                     "temperature": 0.1,
-                    "estimated_input_tokens": int(input_tokens)
+                    "latency_mode": CLAUDE_LATENCY_MODE
                 })
-                tracker.add_metric("context_documents", len(relevant_docs))
-                tracker.add_metric("estimated_input_tokens", int(input_tokens))
+                tracker.add_metric("context_documents", len(context_docs))
+                if count_tokens_enabled:
+                    tracker.add_metric("estimated_input_tokens", count_tokens(prompt))
 
             # Call Claude 3.5 Sonnet
-            body = json.dumps({
+            body = orjson.dumps({
                 "anthropic_version": "bedrock-2023-05-31",
-                "max_tokens": 4000,
+                "max_tokens": MAX_ANSWER_TOKENS,
                 "temperature": 0.1,
                 "messages": [
                     {
@@ -292,31 +566,51 @@ Please provide a helpful, accurate, and well-structured response based on the AW
                 ]
             })
             
-            response = self.bedrock_client.invoke_model(
-                body=body,
-                modelId=self.llm_model,
-                accept="application/json",
-                contentType="application/json"
-            )
-            
-            response_body = json.loads(response["body"].read())
-            claude_response = response_body["content"][0]["text"]
+            text_parts = []
+            for text in self.stream_claude_text(body):
+                if not text_parts and tracker:
+                    tracker.add_metric("time_to_first_token", round(time.monotonic() - tracker.start_time, 3))
+                text_parts.append(text)
+            claude_response = "".join(text_parts)
             
             if tracker:
-                output_tokens = len(claude_response.split()) * 1.3  # Rough estimate
-                tracker.add_metric("estimated_output_tokens", int(output_tokens))
+                if count_tokens_enabled:
+                    tracker.add_metric("estimated_output_tokens", count_tokens(claude_response))
                 tracker.add_step("response_complete", "RAG response generation completed")
             
             logger.info("Generated RAG response using Claude 3.5 Sonnet")
             return claude_response
             
         except Exception as e:
-            logger.error(f"Error generating RAG response: {str(e)}")
+            logger.error("Error generating RAG response: %s", e)
             return f"I apologize, but I encountered an error while generating a response: {str(e)}"
 
+    def stream_claude_text(self, body: bytes) -> Iterator[str]:
+        """Invoke Claude with response streaming, yielding answer text as it is generated."""
+        request = {
+            "body": body,
+            "modelId": self.llm_model,
+            "accept": "application/json",
+            "contentType": "application/json"
+        }
+        # Standard is Bedrock's default, so the setting is sent only when an operator opts in
+        if CLAUDE_LATENCY_MODE != 'standard':
+            request["performanceConfigLatency"] = CLAUDE_LATENCY_MODE
+        
+        response = self.bedrock_client.invoke_model_with_response_stream(**request)
+        
+        for event in response["body"]:
+            chunk = event.get("chunk")
+            # Only text deltas are needed; skip parsing the start, stop and metadata events
+            if not chunk or b'content_block_delta' not in chunk["bytes"]:
+                continue
+            chunk_body = orjson.loads(chunk["bytes"])
+            if chunk_body.get("type") == "content_block_delta":
+                yield chunk_body["delta"].get("text", "")
+
     def process_question(self, user_question: str, top_k: int = 5) -> Dict[str, Any]:
         """Process a user question through the complete RAG pipeline."""
-        logger.info(f"Processing question: '{user_question}'")
+        logger.debug("Processing question: '%s'", user_question)
         
         # Initialize execution tracker
         tracker = ExecutionTracker()
@@ -325,27 +619,55 @@ Please provide a helpful, accurate, and well-structured response based on the AW
         # Step 1: Search for relevant documentation
         relevant_docs = self.search_relevant_docs(user_question, top_k, tracker)
         
+        # Step 2: Generate comprehensive response
+        rag_response = self.generate_rag_response(user_question, relevant_docs, tracker) if relevant_docs else None
+        
+        # Step 3: Prepare final response
+        return self.build_result(user_question, relevant_docs, rag_response, tracker)
+
+    def process_questions(self, user_questions: List[str], top_k: int = 5) -> List[Dict[str, Any]]:
+        """Process several questions together, fanning out each stage on the worker pool."""
+        logger.info("Processing batch of %s questions", len(user_questions))
+        
+        trackers = [ExecutionTracker() for _ in user_questions]
+        for user_question, tracker in zip(user_questions, trackers):
+            tracker.add_step("request_received", f"Processing user question: '{user_question[:50]}...'")
+        
+        docs_per_question = self.search_relevant_docs_batch(user_questions, top_k)
+        
+        # Claude calls are independent, so they run concurrently too
+        rag_responses = list(executor.map(
+            lambda args: self.generate_rag_response(*args) if args[1] else None,
+            zip(user_questions, docs_per_question, trackers)
+        ))
+        
+        return [
+            self.build_result(user_question, relevant_docs, rag_response, tracker)
+            for user_question, relevant_docs, rag_response, tracker
+            in zip(user_questions, docs_per_question, rag_responses, trackers)
+        ]
+
+    def build_result(self, user_question: str, relevant_docs: List[Dict[str, Any]],
+                     rag_response: Optional[str], tracker: ExecutionTracker) -> Dict[str, Any]:
+        """Build the API result for one question; rag_response is None when nothing was found."""
         if not relevant_docs:
             tracker.add_step("no_results", "No relevant documents found")
+            execution_summary = tracker.get_summary()
             return {
                 'question': user_question,
                 'answer': "I couldn't find relevant documentation for your question. Please try rephrasing or asking about a different AWS topic.",
                 'sources': [],
-                'timestamp': datetime.now().isoformat(),
-                'technical_details': tracker.get_summary()
+                'timestamp': execution_summary['timestamp'],
+                'technical_details': execution_summary
             }
         
-        # Step 2: Generate comprehensive response
-        rag_response = self.generate_rag_response(user_question, relevant_docs, tracker)
-        
-        # Step 3: Prepare final response
         execution_summary = tracker.get_summary()
         
         result = {
             'question': user_question,
             'answer': rag_response,
             'sources': relevant_docs,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': execution_summary['timestamp'],
             'model_used': self.llm_model,
             'documents_retrieved': len(relevant_docs),
             'technical_details': execution_summary
@@ -353,6 +675,23 @@ Please provide a helpful, accurate, and well-structured response based on the AW
         
         return result
 
+    def warm_up(self, query_text: str):
+        """Open pooled connections to S3 Vectors and Titan before the first request.
+        
+        Embedding query_text also seeds the embedding cache. Claude has no free
+        operation to warm with, so its connection still opens on first use.
+        """
+        futures = [
+            executor.submit(self.s3vectors_client.list_indexes,
+                            vectorBucketName=self.vector_bucket_name, maxResults=1),
+            executor.submit(self.generate_query_embedding, query_text)
+        ]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.warning("Warm-up call failed: %s", e)
+
 # Global RAG system instance (initialized once per Lambda container)
 rag_system = None
 
@@ -403,6 +742,39 @@ def get_example_questions():
         ]
     }
 
+# Static response bodies, serialized once per Lambda container. Only the health
+# check's timestamp varies, substituted into the pre-serialized body.
+EXAMPLES_BODY = orjson.dumps({
+    'success': True,
+    'data': get_example_questions()
+}).decode()
+
+HEALTH_TIMESTAMP_PLACEHOLDER = '__TIMESTAMP__'
+HEALTH_BODY_TEMPLATE = orjson.dumps({
+    'success': True,
+    'message': 'AWS Documentation RAG System is healthy',
+    'timestamp': HEALTH_TIMESTAMP_PLACEHOLDER
+}).decode()
+
+def prewarm_rag_system():
+    """Build the RAG system and open its connections, logging rather than raising on failure."""
+    try:
+        get_rag_system().warm_up(get_example_questions()['compute'][0])
+    except Exception as e:
+        logger.warning("RAG system pre-warm failed: %s", e)
+
+def reconnect_rag_system():
+    """Replace the clients restored from a SnapStart snapshot, whose sockets are stale, and re-warm."""
+    get_rag_system().connect()
+    prewarm_rag_system()
+
+# Opt in with PREWARM_RAG_SYSTEM=true to warm during Lambda INIT, off the first user's
+# request path. Outside Lambda (local imports, tools) importing never calls AWS.
+if 'AWS_LAMBDA_FUNCTION_NAME' in os.environ and os.environ.get('PREWARM_RAG_SYSTEM', 'false').lower() == 'true':
+    prewarm_rag_system()
+    if register_after_restore:
+        register_after_restore(reconnect_rag_system)
+
 def lambda_handler(event, context):
     """Main Lambda handler for API Gateway requests."""
     try:
@@ -423,12 +795,14 @@ def lambda_handler(event, context):
             return {
                 'statusCode': 200,
                 'headers': cors_headers,
-                'body': json.dumps({'message': 'CORS preflight'})
+                'body': orjson.dumps({'message': 'CORS preflight'}).decode()
             }
         
         # Route requests
         if path == '/ask' and http_method == 'POST':
             return handle_ask_question(body, cors_headers)
+        elif path == '/ask_batch' and http_method == 'POST':
+            return handle_ask_batch(body, cors_headers)
         elif path == '/examples' and http_method == 'GET':
             return handle_get_examples(cors_headers)
         elif path == '/health' and http_method == 'GET':
@@ -437,15 +811,15 @@ def lambda_handler(event, context):
             return {
                 'statusCode': 404,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Endpoint not found'})
+                'body': orjson.dumps({'error': 'Endpoint not found'}).decode()
             }
             
     except Exception as e:
-        logger.error(f"Lambda handler error: {str(e)}")
+        logger.error("Lambda handler error: %s", e)
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Internal server error'})
+            'body': orjson.dumps({'error': 'Internal server error'}).decode()
         }
 
 def handle_ask_question(body, cors_headers):
@@ -455,17 +829,17 @@ def handle_ask_question(body, cors_headers):
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Request body is required'})
+                'body': orjson.dumps({'error': 'Request body is required'}).decode()
             }
         
-        request_data = json.loads(body)
+        request_data = orjson.loads(body)
         question = request_data.get('question', '').strip()
         
         if not question:
             return {
                 'statusCode': 400,
                 'headers': cors_headers,
-                'body': json.dumps({'error': 'Question is required'})
+                'body': orjson.dumps({'error': 'Question is required'}).decode()
             }
         
         # Process the question through RAG system
@@ -475,48 +849,86 @@ def handle_ask_question(body, cors_headers):
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': orjson.dumps({
                 'success': True,
                 'data': result
-            })
+            }).decode()
         }
         
     except Exception as e:
-        logger.error(f"Error processing question: {str(e)}")
+        logger.error("Error processing question: %s", e)
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': f'Error processing question: {str(e)}'})
+            'body': orjson.dumps({'error': f'Error processing question: {str(e)}'}).decode()
         }
 
-def handle_get_examples(cors_headers):
-    """Handle /examples endpoint - return example questions."""
+def handle_ask_batch(body, cors_headers):
+    """Handle /ask_batch endpoint - process several user questions together."""
     try:
-        examples = get_example_questions()
+        if not body:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': orjson.dumps({'error': 'Request body is required'}).decode()
+            }
+        
+        request_data = orjson.loads(body)
+        questions = request_data.get('questions')
+        if not isinstance(questions, list) or not questions:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': orjson.dumps({'error': 'Questions are required'}).decode()
+            }
+        if len(questions) > MAX_BATCH_QUESTIONS:
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': orjson.dumps({'error': f'At most {MAX_BATCH_QUESTIONS} questions per request'}).decode()
+            }
+        
+        questions = [question.strip() if isinstance(question, str) else '' for question in questions]
+        if not all(questions):
+            return {
+                'statusCode': 400,
+                'headers': cors_headers,
+                'body': orjson.dumps({'error': 'Every question must be a non-empty string'}).decode()
+            }
+        
+        # Process the questions through RAG system
+        rag_system = get_rag_system()
+        results = rag_system.process_questions(questions)
+        
         return {
             'statusCode': 200,
             'headers': cors_headers,
-            'body': json.dumps({
+            'body': orjson.dumps({
                 'success': True,
-                'data': examples
-            })
+                'data': results
+            }).decode()
         }
+        
     except Exception as e:
-        logger.error(f"Error getting examples: {str(e)}")
+        logger.error("Error processing questions: %s", e)
         return {
             'statusCode': 500,
             'headers': cors_headers,
-            'body': json.dumps({'error': 'Error getting examples'})
+            'body': orjson.dumps({'error': f'Error processing questions: {str(e)}'}).decode()
         }
 
+def handle_get_examples(cors_headers):
+    """Handle /examples endpoint - return example questions."""
+    return {
+        'statusCode': 200,
+        'headers': cors_headers,
+        'body': EXAMPLES_BODY
+    }
+
 def handle_health_check(cors_headers):
     """Handle /health endpoint - health check."""
     return {
         'statusCode': 200,
         'headers': cors_headers,
-        'body': json.dumps({
-            'success': True,
-            'message': 'AWS Documentation RAG System is healthy',
-            'timestamp': datetime.now().isoformat()
-        })
+        'body': HEALTH_BODY_TEMPLATE.replace(HEALTH_TIMESTAMP_PLACEHOLDER, format_timestamp())
     }
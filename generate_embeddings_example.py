@@ -8,29 +8,197 @@ This script demonstrates how to:
 2. Generate embeddings using Amazon Bedrock
 3. Store embeddings with metadata for vector search
 
+By default embeddings are streamed straight into the S3 Vectors index; pass
+--persist-embeddings to write them to the embeddings directory instead.
+
 Prerequisites:
 - AWS credentials configured (aws configure)
 - Amazon Bedrock access to Titan Text Embeddings V2
 - boto3 installed (pip install boto3)
 """
 
+import argparse
 import json
+import gzip
+import hashlib
+import io
+import itertools
+import sqlite3
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+import numpy as np
 import os
+import random
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Tuple, Iterator, Optional
 import time
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Buffer size for embedding output files
+WRITE_BUFFER_SIZE = 1 << 16
+
+def dumps_json(obj: Any) -> bytes:
+    """Serialize obj as compact UTF-8 JSON, using orjson (with NumPy support) when it is installed"""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False, default=lambda value: value.tolist()).encode('utf-8')
+
+def write_json(path: Path, obj: Any):
+    """Write obj as compact UTF-8 JSON in a single buffered write"""
+    with open(path, 'wb', buffering=WRITE_BUFFER_SIZE) as f:
+        f.write(dumps_json(obj))
+
+# Length of the content preview stored with each vector in S3 Vectors metadata
+CONTENT_PREVIEW_CHARS = 200
+
+# Matrix output: one float32 [N, dimensions] array plus a metadata list whose
+# i-th entry describes row i
+EMBEDDINGS_MATRIX_FILE = "embeddings.npy"
+EMBEDDINGS_METADATA_FILE = "embeddings_metadata.json"
+
+# Sharded output: embeddings-00000.jsonl.gz, embeddings-00001.jsonl.gz, ...
+EMBEDDINGS_SHARD_PREFIX = "embeddings-"
+EMBEDDINGS_SHARD_SUFFIX = ".jsonl.gz"
+
+class ShardedJsonlWriter:
+    """Append records as gzip-compressed JSON lines, starting a new shard every records_per_shard"""
+    
+    def __init__(self, output_path: Path, records_per_shard: int = 10000):
+        self.output_path = output_path
+        self.records_per_shard = records_per_shard
+        self.shard_index = 0
+        self.shard_records = 0
+        self.shard = None
+    
+    def write(self, record: Dict[str, Any]):
+        if self.shard is None or self.shard_records >= self.records_per_shard:
+            self.close()
+            shard_path = self.output_path / f"{EMBEDDINGS_SHARD_PREFIX}{self.shard_index:05d}{EMBEDDINGS_SHARD_SUFFIX}"
+            # Batch the per-record lines before they reach the compressor
+            self.shard = io.BufferedWriter(gzip.open(shard_path, 'wb', compresslevel=6), buffer_size=WRITE_BUFFER_SIZE)
+            self.shard_index += 1
+            self.shard_records = 0
+        self.shard.write(dumps_json(record) + b'\n')
+        self.shard_records += 1
+    
+    def close(self):
+        if self.shard is not None:
+            self.shard.close()
+            self.shard = None
+
+def quantize_fp16(embedding: np.ndarray) -> np.ndarray:
+    """Return the embedding as float16 (2 bytes per dimension instead of 4)"""
+    return embedding.astype(np.float16)
+
+class RateLimiter:
+    """
+    Thread-safe token bucket holding up to one minute of quota, refilled continuously
+    
+    acquire() blocks only when the bucket is empty, so callers run at full speed
+    while under quota. consume() charges usage that is only known afterwards and
+    may leave the bucket in debt, which later acquire() calls wait out.
+    """
+    
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.available = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+    
+    def acquire(self, amount: float = 1):
+        """Block until amount (capped at the bucket size) is available, then take it"""
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.refill_per_second
+            time.sleep(wait)
+    
+    def consume(self, amount: float):
+        """Charge amount without waiting (negative amounts refund)"""
+        with self.lock:
+            self._refill()
+            self.available = min(self.capacity, self.available - amount)
+
+# Bedrock batch inference accepts at most this many records per job
+BATCH_JOB_MAX_RECORDS = 50000
+
+# Throttling errors retried with exponential backoff, on top of botocore's own retries
+RETRYABLE_ERROR_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException'}
+
+# Embedding requests kept outstanding per worker thread when streaming a directory
+EMBEDDINGS_IN_FLIGHT_PER_WORKER = 2
+
 class EmbeddingGenerator:
     """Generate embeddings for chunked AWS documentation"""
     
-    def __init__(self, region_name: str = "us-west-2"):
-        """Initialize the embedding generator with AWS Bedrock client"""
+    def __init__(self, region_name: str = "us-west-2", max_workers: int = 16, requests_per_minute: int = 2000,
+                 tokens_per_minute: int = 300000, max_retries: int = 6,
+                 cache_path: Optional[str] = "embeddings_cache.db", cache_fp16: bool = False):
+        """
+        Initialize the embedding generator with AWS Bedrock client
+        
+        Args:
+            region_name: AWS region for Bedrock
+            max_workers: Number of concurrent embedding requests
+            requests_per_minute: Bedrock InvokeModel quota to stay under
+            tokens_per_minute: Bedrock input-token quota to stay under
+            max_retries: Retries of a throttled InvokeModel call, with exponential backoff
+            cache_path: SQLite file caching embeddings by content hash across runs (None disables)
+            cache_fp16: Store cached embeddings as float16, halving the cache size; cache hits
+                then carry float16 rounding error (about 1e-3 relative)
+        """
+        self.max_workers = max_workers
+        # One thread-safe client shared by all workers, with a pool large enough for all of them
         self.bedrock_runtime = boto3.client(
             service_name='bedrock-runtime',
-            region_name=region_name
+            region_name=region_name,
+            config=Config(
+                max_pool_connections=max_workers * 2,
+                retries={'max_attempts': 10, 'mode': 'adaptive'},
+                tcp_keepalive=True,
+                read_timeout=60,
+                connect_timeout=10
+            )
         )
         self.model_id = "amazon.titan-embed-text-v2:0"
+        self.request_limiter = RateLimiter(requests_per_minute)
+        self.token_limiter = RateLimiter(tokens_per_minute)
+        self.max_retries = max_retries
+        
+        # Control-plane and S3 clients for Bedrock batch inference jobs
+        self.bedrock = boto3.client(service_name='bedrock', region_name=region_name)
+        self.s3 = boto3.client(service_name='s3', region_name=region_name)
+        
+        # Persistent embedding cache, so re-runs only pay for new or changed chunks.
+        # The connection is shared by the worker threads, serialized by a lock.
+        self.cache = None
+        self.cache_fp16 = cache_fp16
+        self.cache_lock = threading.Lock()
+        # Embeddings currently being generated, by cache key
+        self.pending_embeddings = {}
+        self.pending_lock = threading.Lock()
+        if cache_path:
+            self.cache = sqlite3.connect(cache_path, check_same_thread=False)
+            self.cache.execute("PRAGMA journal_mode=WAL")
+            self.cache.execute("CREATE TABLE IF NOT EXISTS cache (key BLOB PRIMARY KEY, emb BLOB, tokens INTEGER)")
+            self.cache.commit()
         
     def generate_embedding(self, text: str, dimensions: int = 1024) -> Dict[str, Any]:
         """
@@ -41,41 +209,228 @@ class EmbeddingGenerator:
             dimensions: Output dimensions (256, 512, or 1024)
             
         Returns:
-            Dictionary containing embedding and metadata
+            Dictionary containing the embedding (a float32 NumPy array) and metadata
         """
         try:
-            # Prepare request body
-            body = json.dumps({
-                "inputText": text,
-                "dimensions": dimensions,
-                "normalize": True,
-                "embeddingTypes": ["float"]
-            })
-            
-            # Call Bedrock API
-            response = self.bedrock_runtime.invoke_model(
-                body=body,
-                modelId=self.model_id,
-                accept="application/json",
-                contentType="application/json"
-            )
-            
-            # Parse response
-            response_body = json.loads(response.get('body').read())
+            # Serve unchanged content from the cache without calling Bedrock
+            cache_key = hashlib.sha256(f"{self.model_id}|{dimensions}|{text}".encode('utf-8')).digest()
+            if self.cache is not None:
+                with self.cache_lock:
+                    row = self.cache.execute("SELECT emb, tokens FROM cache WHERE key = ?", (cache_key,)).fetchone()
+                if row:
+                    # Entries may be float32 or float16, whichever was configured when written
+                    cached_dtype = np.float16 if len(row[0]) == dimensions * 2 else np.float32
+                    embedding = np.frombuffer(row[0], dtype=cached_dtype).astype(np.float32, copy=False)
+                    return {
+                        'embedding': embedding,
+                        'input_token_count': row[1],
+                        'embedding_dimensions': len(embedding),
+                        'model_id': self.model_id,
+                        'success': True
+                    }
             
+            # Duplicate content (boilerplate repeated across pages) shares one Bedrock call
+            # while it is in flight; once stored, later duplicates are cache hits
+            with self.pending_lock:
+                pending = self.pending_embeddings.get(cache_key)
+                if pending is None:
+                    owned = self.pending_embeddings[cache_key] = Future()
+        except Exception as e:
             return {
-                'embedding': response_body['embedding'],
-                'input_token_count': response_body['inputTextTokenCount'],
-                'embedding_dimensions': len(response_body['embedding']),
-                'model_id': self.model_id,
-                'success': True
+                'error': str(e),
+                'success': False
             }
-            
+        
+        if pending is not None:
+            return dict(pending.result())
+        
+        try:
+            result = self.invoke_embedding_model(text, dimensions, cache_key)
         except Exception as e:
-            return {
+            result = {
                 'error': str(e),
                 'success': False
             }
+        
+        with self.pending_lock:
+            del self.pending_embeddings[cache_key]
+        owned.set_result(result)
+        return result
+    
+    def invoke_embedding_model(self, text: str, dimensions: int, cache_key: bytes) -> Dict[str, Any]:
+        """Embed text with Bedrock within the rate limits and store the result in the cache"""
+        # Prepare request body
+        body = json.dumps({
+            "inputText": text,
+            "dimensions": dimensions,
+            "normalize": True,
+            "embeddingTypes": ["float"]
+        })
+        
+        # Call Bedrock API within the request and token quotas. Tokens are reserved
+        # from a length estimate and corrected once the real count is known.
+        estimated_tokens = len(text) // 4 + 1
+        self.request_limiter.acquire()
+        self.token_limiter.acquire(estimated_tokens)
+        response = self.invoke_with_backoff(body)
+        
+        # Parse response straight into a float32 array
+        raw_body = response['body'].read()
+        response_body = orjson.loads(raw_body) if orjson else json.loads(raw_body)
+        embedding = np.asarray(response_body['embedding'], dtype=np.float32)
+        self.token_limiter.consume(response_body['inputTextTokenCount'] - estimated_tokens)
+        
+        if self.cache is not None:
+            with self.cache_lock:
+                self.cache.execute(
+                    "INSERT OR REPLACE INTO cache (key, emb, tokens) VALUES (?, ?, ?)",
+                    (cache_key, (quantize_fp16(embedding) if self.cache_fp16 else embedding).tobytes(),
+                     response_body['inputTextTokenCount'])
+                )
+                self.cache.commit()
+        
+        return {
+            'embedding': embedding,
+            'input_token_count': response_body['inputTextTokenCount'],
+            'embedding_dimensions': len(embedding),
+            'model_id': self.model_id,
+            'success': True
+        }
+    
+    def invoke_with_backoff(self, body: str) -> Dict[str, Any]:
+        """Call InvokeModel, retrying throttling errors with capped, jittered exponential backoff"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.bedrock_runtime.invoke_model(
+                    body=body,
+                    modelId=self.model_id,
+                    accept="application/json",
+                    contentType="application/json"
+                )
+            except ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in RETRYABLE_ERROR_CODES or attempt == self.max_retries:
+                    raise
+                time.sleep(min(30.0, 2 ** attempt) * random.uniform(0.5, 1.0))
+    
+    def combine_chunk_and_embedding(self, chunk_data: Dict[str, Any], embedding_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the saved embedding record from chunk data and a generate_embedding-style result"""
+        if embedding_result['success']:
+            # Combine chunk data with embedding
+            return {
+                'chunk_id': chunk_data['chunk_id'],
+                'source_file': chunk_data['source_file'],
+                'title': chunk_data['title'],
+                'section': chunk_data['section'],
+                'content': chunk_data['content'],
+                # Precomputed so the insertion step never has to slice the content
+                'content_preview': chunk_data['content'][:CONTENT_PREVIEW_CHARS],
+                'content_length': len(chunk_data['content']),
+                'token_count': chunk_data['token_count'],
+                'char_count': chunk_data['char_count'],
+                'metadata': chunk_data['metadata'],
+                'embedding': embedding_result['embedding'],
+                'embedding_dimensions': embedding_result['embedding_dimensions'],
+                'embedding_token_count': embedding_result['input_token_count'],
+                'model_id': embedding_result['model_id'],
+                'processing_success': True
+            }
+        else:
+            return {
+                'chunk_id': chunk_data.get('chunk_id', 'unknown'),
+                'error': embedding_result['error'],
+                'processing_success': False
+            }
+    
+    def generate_embeddings_batch(self,
+                                  records: List[Tuple[str, str]],
+                                  s3_bucket: str,
+                                  s3_prefix: str,
+                                  role_arn: str,
+                                  dimensions: int = 1024,
+                                  poll_seconds: int = 60) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Generate embeddings with Bedrock batch inference instead of one InvokeModel call per text
+        
+        Records are uploaded to S3 as JSONL, embedded by a model invocation job, and
+        the job output is read back from S3. Batch jobs are billed at a discount but
+        take minutes to start, and Bedrock requires a minimum number of records per job,
+        so this suits full re-indexing runs rather than small updates.
+        
+        Args:
+            records: (record_id, text) pairs, e.g. (chunk_id, chunk content)
+            s3_bucket: Bucket for job input and output
+            s3_prefix: Key prefix under which input/ and output/ are written
+            role_arn: IAM role Bedrock assumes to read and write the bucket
+            dimensions: Output dimensions for embeddings
+            poll_seconds: Delay between job status checks
+            
+        Yields:
+            (record_id, result) pairs, where result has the same shape as generate_embedding()
+        """
+        for start in range(0, len(records), BATCH_JOB_MAX_RECORDS):
+            sub_batch = records[start:start + BATCH_JOB_MAX_RECORDS]
+            job_name = f"titan-embeddings-{int(time.time())}-{start // BATCH_JOB_MAX_RECORDS}"
+            input_key = f"{s3_prefix}/input/{job_name}.jsonl"
+            output_prefix = f"{s3_prefix}/output/"
+            
+            # Upload the job input, one modelInput per line
+            self.s3.put_object(
+                Bucket=s3_bucket,
+                Key=input_key,
+                Body='\n'.join(
+                    json.dumps({
+                        "recordId": record_id,
+                        "modelInput": {"inputText": text, "dimensions": dimensions, "normalize": True}
+                    }, ensure_ascii=False)
+                    for record_id, text in sub_batch
+                ).encode('utf-8')
+            )
+            
+            job_arn = self.bedrock.create_model_invocation_job(
+                jobName=job_name,
+                roleArn=role_arn,
+                modelId=self.model_id,
+                inputDataConfig={'s3InputDataConfig': {'s3Uri': f"s3://{s3_bucket}/{input_key}"}},
+                outputDataConfig={'s3OutputDataConfig': {'s3Uri': f"s3://{s3_bucket}/{output_prefix}"}}
+            )['jobArn']
+            print(f"Started batch inference job {job_name} for {len(sub_batch)} records")
+            
+            # Wait for the job to finish
+            while True:
+                status = self.bedrock.get_model_invocation_job(jobIdentifier=job_arn)['status']
+                if status in ('Completed', 'PartiallyCompleted'):
+                    break
+                if status in ('Failed', 'Stopped', 'Expired'):
+                    raise RuntimeError(f"Batch inference job {job_name} ended with status {status}")
+                time.sleep(poll_seconds)
+            
+            # Output lands under <output prefix>/<job id>/ as <input file>.out
+            job_id = job_arn.rsplit('/', 1)[-1]
+            paginator = self.s3.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=s3_bucket, Prefix=f"{output_prefix}{job_id}/"):
+                for obj in page.get('Contents', []):
+                    if not obj['Key'].endswith('.jsonl.out'):
+                        continue
+                    body = self.s3.get_object(Bucket=s3_bucket, Key=obj['Key'])['Body']
+                    for line in body.iter_lines():
+                        if not line:
+                            continue
+                        output_record = json.loads(line)
+                        model_output = output_record.get('modelOutput')
+                        if model_output:
+                            yield output_record['recordId'], {
+                                'embedding': model_output['embedding'],
+                                'input_token_count': model_output['inputTextTokenCount'],
+                                'embedding_dimensions': len(model_output['embedding']),
+                                'model_id': self.model_id,
+                                'success': True
+                            }
+                        else:
+                            error = output_record.get('error', {})
+                            yield output_record['recordId'], {
+                                'error': error.get('errorMessage', str(error)) if isinstance(error, dict) else str(error),
+                                'success': False
+                            }
     
     def process_chunk_file(self, chunk_file_path: str, dimensions: int = 1024) -> Dict[str, Any]:
         """
@@ -99,31 +454,7 @@ class EmbeddingGenerator:
                 dimensions=dimensions
             )
             
-            if embedding_result['success']:
-                # Combine chunk data with embedding
-                result = {
-                    'chunk_id': chunk_data['chunk_id'],
-                    'source_file': chunk_data['source_file'],
-                    'title': chunk_data['title'],
-                    'section': chunk_data['section'],
-                    'content': chunk_data['content'],
-                    'token_count': chunk_data['token_count'],
-                    'char_count': chunk_data['char_count'],
-                    'metadata': chunk_data['metadata'],
-                    'embedding': embedding_result['embedding'],
-                    'embedding_dimensions': embedding_result['embedding_dimensions'],
-                    'embedding_token_count': embedding_result['input_token_count'],
-                    'model_id': embedding_result['model_id'],
-                    'processing_success': True
-                }
-            else:
-                result = {
-                    'chunk_id': chunk_data.get('chunk_id', 'unknown'),
-                    'error': embedding_result['error'],
-                    'processing_success': False
-                }
-            
-            return result
+            return self.combine_chunk_and_embedding(chunk_data, embedding_result)
             
         except Exception as e:
             return {
@@ -132,11 +463,119 @@ class EmbeddingGenerator:
                 'processing_success': False
             }
     
+    def iter_chunk_files(self, chunks_path: Path, max_chunks: int = None) -> Iterator[Path]:
+        """Yield chunk files (excluding summary files) in one scandir pass, optionally capped for testing"""
+        def scan():
+            with os.scandir(chunks_path) as entries:
+                for entry in entries:
+                    if (entry.name.endswith('.json') and "_chunks.json" not in entry.name
+                            and entry.name != "processing_stats.json" and entry.is_file()):
+                        yield Path(entry.path)
+        
+        return itertools.islice(scan(), max_chunks) if max_chunks else scan()
+    
+    def save_embedding_result(self, output_path: Path, result: Dict[str, Any]):
+        """Save a successful embedding record as <chunk_id>_embedding.json"""
+        embedding_filename = f"{result['chunk_id']}_embedding.json"
+        embedding_path = output_path / embedding_filename
+        
+        write_json(embedding_path, result)
+    
+    def save_embedding_matrix(self, output_path: Path, embeddings: np.ndarray, records: List[Dict[str, Any]]):
+        """Save a float32 embedding matrix with a row-aligned metadata sidecar"""
+        np.save(output_path / EMBEDDINGS_MATRIX_FILE, embeddings)
+        write_json(output_path / EMBEDDINGS_METADATA_FILE, records)
+    
+    def new_processing_stats(self, dimensions: int) -> Dict[str, Any]:
+        """Return an empty statistics dict for a processing run"""
+        return {
+            'total_chunks': 0,
+            'successful_embeddings': 0,
+            'failed_embeddings': 0,
+            'total_tokens_processed': 0,
+            'total_embedding_dimensions': dimensions,
+            'processing_errors': []
+        }
+    
+    def generate_embeddings_iter(self,
+                                 chunks_dir: str,
+                                 dimensions: int = 1024,
+                                 max_chunks: int = None,
+                                 stats: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Embed every chunk file in a directory, yielding successful results as they complete
+        
+        Nothing is written to disk, so results can be fed straight to S3VectorsInserter;
+        failures are only recorded in stats.
+        
+        Args:
+            chunks_dir: Directory containing chunk JSON files
+            dimensions: Output dimensions for embeddings
+            max_chunks: Maximum number of chunks to process (for testing)
+            stats: Statistics dict (see new_processing_stats) updated as chunks complete
+            
+        Yields:
+            Chunk data combined with its embedding (a float32 NumPy array)
+        """
+        if stats is None:
+            stats = self.new_processing_stats(dimensions)
+        
+        chunk_files = list(self.iter_chunk_files(Path(chunks_dir), max_chunks))
+        stats['total_chunks'] = len(chunk_files)
+        print(f"Found {len(chunk_files)} chunk files to process")
+        
+        # Embed chunks concurrently, keeping at most EMBEDDINGS_IN_FLIGHT_PER_WORKER
+        # requests per worker outstanding. A result is dropped from `in_flight` once
+        # yielded, so memory is bounded by the window rather than the directory size.
+        max_in_flight = EMBEDDINGS_IN_FLIGHT_PER_WORKER * self.max_workers
+        completed = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            in_flight = {}
+            pending_files = iter(chunk_files)
+            while True:
+                for chunk_file in itertools.islice(pending_files, max_in_flight - len(in_flight)):
+                    in_flight[executor.submit(self.process_chunk_file, str(chunk_file), dimensions)] = chunk_file
+                if not in_flight:
+                    break
+                
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    chunk_file = in_flight.pop(future)
+                    completed += 1
+                    print(f"Completed chunk {completed}/{len(chunk_files)}: {chunk_file.name}")
+                    
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        stats['failed_embeddings'] += 1
+                        error_msg = f"Error processing {chunk_file.name}: {str(e)}"
+                        stats['processing_errors'].append({
+                            'chunk_file': chunk_file.name,
+                            'error': str(e)
+                        })
+                        print(f"  ✗ Error: {error_msg}")
+                        continue
+                    
+                    if result['processing_success']:
+                        stats['successful_embeddings'] += 1
+                        stats['total_tokens_processed'] += result['embedding_token_count']
+                        
+                        print(f"  ✓ Generated {result['embedding_dimensions']}D embedding ({result['embedding_token_count']} tokens)")
+                        yield result
+                    else:
+                        stats['failed_embeddings'] += 1
+                        stats['processing_errors'].append({
+                            'chunk_file': chunk_file.name,
+                            'error': result.get('error', 'Unknown error')
+                        })
+                        print(f"  ✗ Failed: {result.get('error', 'Unknown error')}")
+    
     def process_chunks_directory(self, 
                                 chunks_dir: str, 
                                 output_dir: str,
                                 dimensions: int = 1024,
-                                max_chunks: int = None) -> Dict[str, Any]:
+                                max_chunks: int = None,
+                                output_format: str = "json") -> Dict[str, Any]:
         """
         Process all chunk files in a directory and generate embeddings
         
@@ -145,85 +584,135 @@ class EmbeddingGenerator:
             output_dir: Directory to save embeddings
             dimensions: Output dimensions for embeddings
             max_chunks: Maximum number of chunks to process (for testing)
+            output_format: "json" for one <chunk_id>_embedding.json file per chunk,
+                "npy" for a single embeddings.npy matrix plus embeddings_metadata.json, or
+                "jsonl.gz" for gzip-compressed JSON-lines shards of 10k records each
             
         Returns:
             Processing statistics
         """
-        chunks_path = Path(chunks_dir)
         output_path = Path(output_dir)
         output_path.mkdir(parents=True, exist_ok=True)
         
-        # Find all chunk files (exclude summary files)
-        chunk_files = [f for f in chunks_path.glob("*.json") if "_chunks.json" not in f.name and "processing_stats.json" not in f.name]
+        stats = self.new_processing_stats(dimensions)
         
-        if max_chunks:
-            chunk_files = chunk_files[:max_chunks]
+        # Rows and metadata for the "npy" output format
+        embedding_matrix = None
+        embedding_records = []
+        shard_writer = ShardedJsonlWriter(output_path) if output_format == "jsonl.gz" else None
         
-        print(f"Found {len(chunk_files)} chunk files to process")
+        for result in self.generate_embeddings_iter(chunks_dir, dimensions, max_chunks, stats):
+            # Save embedding with metadata
+            if output_format == "npy":
+                # Filled in completion order into a buffer sized once the chunk count is known
+                if embedding_matrix is None:
+                    embedding_matrix = np.empty((stats['total_chunks'], dimensions), dtype=np.float32)
+                embedding_matrix[len(embedding_records)] = result.pop('embedding')
+                embedding_records.append(result)
+            elif shard_writer:
+                shard_writer.write(result)
+            else:
+                self.save_embedding_result(output_path, result)
         
-        # Statistics tracking
-        stats = {
-            'total_chunks': len(chunk_files),
-            'successful_embeddings': 0,
-            'failed_embeddings': 0,
-            'total_tokens_processed': 0,
-            'total_embedding_dimensions': dimensions,
-            'processing_errors': []
-        }
+        if shard_writer:
+            shard_writer.close()
+        if embedding_records:
+            # Trim the unused rows left by failed chunks; the slice is a view, not a copy
+            self.save_embedding_matrix(output_path, embedding_matrix[:len(embedding_records)], embedding_records)
+        
+        # Save processing statistics
+        stats_path = output_path / 'embedding_stats.json'
+        write_json(stats_path, stats)
         
-        # Process each chunk
-        for i, chunk_file in enumerate(chunk_files, 1):
-            print(f"Processing chunk {i}/{len(chunk_files)}: {chunk_file.name}")
+        return stats
+    
+    def process_chunks_directory_batch(self,
+                                       chunks_dir: str,
+                                       output_dir: str,
+                                       s3_bucket: str,
+                                       role_arn: str,
+                                       s3_prefix: str = "embedding-batch-jobs",
+                                       dimensions: int = 1024,
+                                       max_chunks: int = None) -> Dict[str, Any]:
+        """
+        Like process_chunks_directory, but embeds every chunk through Bedrock batch
+        inference jobs instead of per-chunk InvokeModel calls
+        
+        Args:
+            chunks_dir: Directory containing chunk JSON files
+            output_dir: Directory to save embeddings
+            s3_bucket: Bucket for batch job input and output
+            role_arn: IAM role Bedrock assumes for the batch job
+            s3_prefix: Key prefix for batch job files
+            dimensions: Output dimensions for embeddings
+            max_chunks: Maximum number of chunks to process (for testing)
             
+        Returns:
+            Processing statistics
+        """
+        output_path = Path(output_dir)
+        output_path.mkdir(parents=True, exist_ok=True)
+        
+        chunk_files = list(self.iter_chunk_files(Path(chunks_dir), max_chunks))
+        print(f"Found {len(chunk_files)} chunk files to process")
+        
+        stats = self.new_processing_stats(dimensions)
+        stats['total_chunks'] = len(chunk_files)
+        
+        # Collect all chunk texts up front; the job needs them in a single input file
+        chunks_by_id = {}
+        for chunk_file in chunk_files:
             try:
-                # Generate embedding for chunk
-                result = self.process_chunk_file(str(chunk_file), dimensions)
-                
-                if result['processing_success']:
-                    # Save embedding with metadata
-                    embedding_filename = f"{result['chunk_id']}_embedding.json"
-                    embedding_path = output_path / embedding_filename
-                    
-                    with open(embedding_path, 'w', encoding='utf-8') as f:
-                        json.dump(result, f, indent=2, ensure_ascii=False)
-                    
-                    stats['successful_embeddings'] += 1
-                    stats['total_tokens_processed'] += result['embedding_token_count']
-                    
-                    print(f"  ✓ Generated {result['embedding_dimensions']}D embedding ({result['embedding_token_count']} tokens)")
-                else:
-                    stats['failed_embeddings'] += 1
-                    stats['processing_errors'].append({
-                        'chunk_file': chunk_file.name,
-                        'error': result.get('error', 'Unknown error')
-                    })
-                    print(f"  ✗ Failed: {result.get('error', 'Unknown error')}")
-                
-                # Add small delay to avoid rate limiting
-                time.sleep(0.1)
-                
+                with open(chunk_file, 'r', encoding='utf-8') as f:
+                    chunk_data = json.load(f)
+                chunks_by_id[chunk_data['chunk_id']] = (chunk_file, chunk_data)
             except Exception as e:
                 stats['failed_embeddings'] += 1
-                error_msg = f"Error processing {chunk_file.name}: {str(e)}"
-                stats['processing_errors'].append({
-                    'chunk_file': chunk_file.name,
-                    'error': str(e)
-                })
-                print(f"  ✗ Error: {error_msg}")
+                stats['processing_errors'].append({'chunk_file': chunk_file.name, 'error': str(e)})
+        
+        records = [(chunk_id, chunk_data['content']) for chunk_id, (_, chunk_data) in chunks_by_id.items()]
+        for chunk_id, embedding_result in self.generate_embeddings_batch(records, s3_bucket, s3_prefix, role_arn, dimensions):
+            if chunk_id not in chunks_by_id:
+                continue
+            chunk_file, chunk_data = chunks_by_id.pop(chunk_id)
+            result = self.combine_chunk_and_embedding(chunk_data, embedding_result)
+            
+            if result['processing_success']:
+                self.save_embedding_result(output_path, result)
+                stats['successful_embeddings'] += 1
+                stats['total_tokens_processed'] += result['embedding_token_count']
+            else:
+                stats['failed_embeddings'] += 1
+                stats['processing_errors'].append({'chunk_file': chunk_file.name, 'error': result.get('error', 'Unknown error')})
+        
+        # Records missing from the job output were never processed
+        for chunk_file, _ in chunks_by_id.values():
+            stats['failed_embeddings'] += 1
+            stats['processing_errors'].append({'chunk_file': chunk_file.name, 'error': 'No output from batch inference job'})
         
         # Save processing statistics
         stats_path = output_path / 'embedding_stats.json'
-        with open(stats_path, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2, ensure_ascii=False)
+        write_json(stats_path, stats)
         
         return stats
 
 def main():
     """Main function to generate embeddings for all chunks"""
+    parser = argparse.ArgumentParser(description='Generate embeddings for AWS documentation chunks')
+    parser.add_argument('--persist-embeddings', action='store_true',
+                        help='Write embeddings to disk instead of streaming them into S3 Vectors')
+    args = parser.parse_args()
     
     # Configuration
     chunks_directory = "/Users/vibhup/Downloads/embeddingdataset/AWSDataset-chunked"
     embeddings_directory = "/Users/vibhup/Downloads/embeddingdataset/AWSDataset-embeddings"
+    # Set both to embed through a Bedrock batch inference job instead of per-chunk calls
+    batch_job_bucket = None
+    batch_job_role_arn = None
+    # Target index when streaming embeddings straight into S3 Vectors
+    vector_bucket_name = "YOUR-VECTOR-BUCKET"
+    vector_index_name = "aws-documentation"
+    vector_region = "us-east-1"
     
     print("AWS Documentation Embedding Generation")
     print("=" * 60)
@@ -244,12 +733,40 @@ def main():
     print("\nProcessing all chunks to generate embeddings...")
     
     try:
-        stats = generator.process_chunks_directory(
-            chunks_dir=chunks_directory,
-            output_dir=embeddings_directory,
-            dimensions=1024,  # Use 1024 dimensions for good balance of quality and cost
-            max_chunks=None   # Process ALL chunks
-        )
+        if batch_job_bucket and batch_job_role_arn:
+            stats = generator.process_chunks_directory_batch(
+                chunks_dir=chunks_directory,
+                output_dir=embeddings_directory,
+                s3_bucket=batch_job_bucket,
+                role_arn=batch_job_role_arn,
+                dimensions=1024
+            )
+        elif not args.persist_embeddings:
+            # Imported here so the on-disk modes don't need the inserter's log file
+            from insert_embeddings_to_s3_vectors import S3VectorsInserter
+            
+            inserter = S3VectorsInserter(
+                vector_bucket_name=vector_bucket_name,
+                index_name=vector_index_name,
+                region_name=vector_region
+            )
+            stats = generator.new_processing_stats(dimensions=1024)
+            vector_records = (
+                inserter.prepare_vector_for_s3({**result, 'embedding': result['embedding'].tolist()})
+                for result in generator.generate_embeddings_iter(chunks_directory, dimensions=1024, stats=stats)
+            )
+            inserter.insert_vectors_stream(vector_records)
+            
+            # Chunks that failed to embed count against the insertion success rate
+            inserter.stats['total_embeddings'] = stats['total_chunks']
+            inserter.print_final_statistics()
+        else:
+            stats = generator.process_chunks_directory(
+                chunks_dir=chunks_directory,
+                output_dir=embeddings_directory,
+                dimensions=1024,  # Use 1024 dimensions for good balance of quality and cost
+                max_chunks=None   # Process ALL chunks
+            )
         
         # Print results
         print("\nProcessing Complete!")
@@ -265,7 +782,8 @@ def main():
             for error in stats['processing_errors'][:5]:  # Show first 5 errors
                 print(f"  - {error['chunk_file']}: {error['error']}")
         
-        print(f"\nEmbeddings saved to: {embeddings_directory}")
+        if args.persist_embeddings or (batch_job_bucket and batch_job_role_arn):
+            print(f"\nEmbeddings saved to: {embeddings_directory}")
         print("Ready for vector search applications!")
         
     except Exception as e:
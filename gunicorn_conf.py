@@ -0,0 +1,37 @@
+"""
+Gunicorn configuration for the AWS Documentation RAG web application.
+
+Every /api/ask request spends nearly all of its time waiting on Bedrock and
+S3 Vectors, so the app is served by gevent workers: each worker process keeps
+many requests in flight on green threads instead of one per OS thread.
+Gunicorn's gevent worker monkey-patches the standard library (sockets, ssl,
+threading) before the app is imported, so boto3 calls yield cooperatively.
+
+Usage:
+    pip install gunicorn gevent flask-session redis
+    export FLASK_SECRET_KEY=... REDIS_URL=redis://localhost:6379/0
+    gunicorn -c gunicorn_conf.py app:app
+"""
+
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+worker_class = "gevent"
+worker_connections = 1000
+
+# Claude generation can take tens of seconds; keep idle connections open for reuse
+timeout = 120
+keepalive = 30
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_worker_init(worker):
+    """Initialize the RAG system once per worker process."""
+    import app
+
+    if not app.initialize_rag_system():
+        worker.log.error("Failed to initialize RAG system; /api/ask will return errors")
@@ -16,16 +16,60 @@ Features:
 
 import os
 import re
+import asyncio
 import json
 import hashlib
+import itertools
+import mmap
 from pathlib import Path
-from typing import List, Dict, Any, Tuple
-from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Tuple, Optional
+from dataclasses import dataclass
 import tiktoken
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Relative distance from a token threshold beyond which the length-based
+# estimate is trusted instead of running the tokenizer
+APPROX_TOKEN_MARGIN = 0.5
+
+# Patterns compiled once. Headers are found with a single multiline sweep over
+# the whole document; surrounding whitespace is matched without crossing lines.
+_HEADER_RE = re.compile(r'^[^\S\n]*(#{1,6})[^\S\n]+(\S.*?)[^\S\n]*$', re.MULTILINE)
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+def write_json(path: Path, obj: Any):
+    """Write obj as indented UTF-8 JSON, using orjson when it is installed"""
+    if orjson:
+        path.write_bytes(orjson.dumps(obj, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=2, ensure_ascii=False)
+
+def read_text_file(path: Path) -> str:
+    """
+    Read a UTF-8 text file by decoding a read-only memory map, avoiding an
+    intermediate bytes copy; newlines are normalized as in text-mode reads
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            text = str(mapped, 'utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
 @dataclass
 class DocumentChunk:
     """Represents a chunk of a document with metadata"""
+    # Explicit slots (dataclass(slots=True) needs Python 3.10) keep chunks compact
+    __slots__ = ('chunk_id', 'source_file', 'title', 'section', 'content', 'token_count', 'char_count',
+                 'chunk_index', 'total_chunks', 'overlap_with_previous', 'metadata')
+    
     chunk_id: str
     source_file: str
     title: str
@@ -37,6 +81,22 @@ class DocumentChunk:
     total_chunks: int
     overlap_with_previous: bool
     metadata: Dict[str, Any]
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Shallow dict of the chunk for JSON output; avoids asdict's recursive deep copy"""
+        return {
+            'chunk_id': self.chunk_id,
+            'source_file': self.source_file,
+            'title': self.title,
+            'section': self.section,
+            'content': self.content,
+            'token_count': self.token_count,
+            'char_count': self.char_count,
+            'chunk_index': self.chunk_index,
+            'total_chunks': self.total_chunks,
+            'overlap_with_previous': self.overlap_with_previous,
+            'metadata': self.metadata
+        }
 
 class AWSDocumentChunker:
     """Chunks AWS documentation for optimal embedding generation"""
@@ -72,51 +132,43 @@ class AWSDocumentChunker:
             # Fallback: estimate 4.7 characters per token (AWS documentation states this for English)
             return int(len(text) / 4.7)
     
-    def extract_title_from_content(self, content: str) -> str:
-        """Extract the main title from markdown content"""
-        lines = content.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('# ') and not line.startswith('## '):
-                return line[2:].strip()
-        return "Untitled Document"
+    def _approx_tokens(self, text: str) -> float:
+        """Cheap token estimate (4.7 characters per token) for threshold checks far from the boundary"""
+        return len(text) * 0.213
+    
+    def count_tokens_batch(self, texts: List[str]) -> List[int]:
+        """Count tokens for many texts with a single batched tiktoken call"""
+        if self.tokenizer:
+            return [len(tokens) for tokens in self.tokenizer.encode_ordinary_batch(texts)]
+        else:
+            return [int(len(text) / 4.7) for text in texts]
     
-    def split_by_headers(self, content: str) -> List[Tuple[str, str, int]]:
+    def split_sections(self, content: str) -> Tuple[str, List[Tuple[str, str, int]]]:
         """
-        Split content by markdown headers, returning (section_title, content, header_level)
+        Split content by markdown headers in a single regex sweep over the document
+        
+        Returns (document_title, sections) where each section is
+        (section_title, content, header_level) and the document title is the
+        first level-1 header. Each section runs from its header line up to the
+        next header; text before the first header is dropped.
         """
+        doc_title = None
         sections = []
-        lines = content.split('\n')
-        current_section = []
-        current_title = ""
-        current_level = 0
-        
-        for line in lines:
-            # Check if line is a header
-            header_match = re.match(r'^(#{1,6})\s+(.+)$', line.strip())
-            
-            if header_match:
-                # Save previous section if it exists
-                if current_section and current_title:
-                    section_content = '\n'.join(current_section).strip()
-                    if section_content:
-                        sections.append((current_title, section_content, current_level))
-                
-                # Start new section
-                header_level = len(header_match.group(1))
-                current_title = header_match.group(2).strip()
-                current_level = header_level
-                current_section = [line]  # Include the header in the section
-            else:
-                current_section.append(line)
+        header_matches = list(_HEADER_RE.finditer(content))
         
-        # Add the last section
-        if current_section and current_title:
-            section_content = '\n'.join(current_section).strip()
+        for i, header_match in enumerate(header_matches):
+            section_title = header_match.group(2)
+            header_level = len(header_match.group(1))
+            if doc_title is None and header_level == 1:
+                doc_title = section_title
+            
+            # Slice from this header (included in the section) to the next one
+            section_end = header_matches[i + 1].start() if i + 1 < len(header_matches) else len(content)
+            section_content = content[header_match.start():section_end].strip()
             if section_content:
-                sections.append((current_title, section_content, current_level))
+                sections.append((section_title, section_content, header_level))
         
-        return sections
+        return doc_title or "Untitled Document", sections
     
     def chunk_large_section(self, title: str, content: str) -> List[Tuple[str, str]]:
         """
@@ -126,83 +178,73 @@ class AWSDocumentChunker:
         chunks = []
         
         # Split by paragraphs first
-        paragraphs = [p.strip() for p in content.split('\n\n') if p.strip()]
+        paragraphs = [p for p in map(str.strip, content.split('\n\n')) if p]
         
-        current_chunk = []
-        current_tokens = 0
+        # Tokenize every paragraph once; running totals give any span's token count
+        paragraph_counts = self.count_tokens_batch(paragraphs)
+        cumulative_tokens = [0, *itertools.accumulate(paragraph_counts)]
+        
+        # The current chunk is always the contiguous span paragraphs[chunk_start:i]
+        chunk_start = 0
         chunk_index = 1
         
-        for paragraph in paragraphs:
-            paragraph_tokens = self.count_tokens(paragraph)
-            
+        for i, paragraph_tokens in enumerate(paragraph_counts):
             # If single paragraph exceeds limit, split by sentences
             if paragraph_tokens > self.max_tokens:
                 # Save current chunk if it has content
-                if current_chunk:
-                    chunk_content = '\n\n'.join(current_chunk)
+                if chunk_start < i:
+                    chunk_content = '\n\n'.join(paragraphs[chunk_start:i])
                     chunk_title = f"{title} (Part {chunk_index})"
                     chunks.append((chunk_title, chunk_content))
                     chunk_index += 1
-                    current_chunk = []
-                    current_tokens = 0
                 
                 # Split large paragraph by sentences
-                sentences = re.split(r'(?<=[.!?])\s+', paragraph)
-                sentence_chunk = []
+                sentences = _SENT_SPLIT_RE.split(paragraphs[i])
+                sentence_start = 0
                 sentence_tokens = 0
                 
-                for sentence in sentences:
-                    sentence_token_count = self.count_tokens(sentence)
-                    
-                    if sentence_tokens + sentence_token_count > self.max_tokens and sentence_chunk:
+                # Sentences are joined only when a chunk is emitted
+                for j, sentence_token_count in enumerate(self.count_tokens_batch(sentences)):
+                    if sentence_tokens + sentence_token_count > self.max_tokens and sentence_start < j:
                         # Save sentence chunk
-                        chunk_content = ' '.join(sentence_chunk)
+                        chunk_content = ' '.join(sentences[sentence_start:j])
                         chunk_title = f"{title} (Part {chunk_index})"
                         chunks.append((chunk_title, chunk_content))
                         chunk_index += 1
-                        sentence_chunk = [sentence]
+                        sentence_start = j
                         sentence_tokens = sentence_token_count
                     else:
-                        sentence_chunk.append(sentence)
                         sentence_tokens += sentence_token_count
                 
                 # Add remaining sentences as a chunk
-                if sentence_chunk:
-                    chunk_content = ' '.join(sentence_chunk)
+                if sentence_start < len(sentences):
+                    chunk_content = ' '.join(sentences[sentence_start:])
                     chunk_title = f"{title} (Part {chunk_index})"
                     chunks.append((chunk_title, chunk_content))
                     chunk_index += 1
+                
+                chunk_start = i + 1
             
             # Check if adding this paragraph would exceed the limit
-            elif current_tokens + paragraph_tokens > self.max_tokens:
-                # Save current chunk
-                if current_chunk:
-                    chunk_content = '\n\n'.join(current_chunk)
+            elif cumulative_tokens[i + 1] - cumulative_tokens[chunk_start] > self.max_tokens:
+                if chunk_start < i:
+                    # Save current chunk
+                    chunk_content = '\n\n'.join(paragraphs[chunk_start:i])
                     chunk_title = f"{title} (Part {chunk_index})" if chunk_index > 1 else title
                     chunks.append((chunk_title, chunk_content))
                     chunk_index += 1
-                
-                # Start new chunk with overlap
-                if current_chunk and self.overlap_tokens > 0:
-                    # Add last paragraph from previous chunk for context
-                    overlap_content = current_chunk[-1]
-                    overlap_tokens = self.count_tokens(overlap_content)
-                    if overlap_tokens <= self.overlap_tokens:
-                        current_chunk = [overlap_content, paragraph]
-                        current_tokens = overlap_tokens + paragraph_tokens
+                    
+                    # Start new chunk with the last paragraph of the previous one for context
+                    if self.overlap_tokens > 0 and paragraph_counts[i - 1] <= self.overlap_tokens:
+                        chunk_start = i - 1
                     else:
-                        current_chunk = [paragraph]
-                        current_tokens = paragraph_tokens
+                        chunk_start = i
                 else:
-                    current_chunk = [paragraph]
-                    current_tokens = paragraph_tokens
-            else:
-                current_chunk.append(paragraph)
-                current_tokens += paragraph_tokens
+                    chunk_start = i
         
         # Add final chunk
-        if current_chunk:
-            chunk_content = '\n\n'.join(current_chunk)
+        if chunk_start < len(paragraphs):
+            chunk_content = '\n\n'.join(paragraphs[chunk_start:])
             chunk_title = f"{title} (Part {chunk_index})" if chunk_index > 1 else title
             chunks.append((chunk_title, chunk_content))
         
@@ -214,43 +256,61 @@ class AWSDocumentChunker:
         """
         chunks = []
         file_name = os.path.basename(file_path)
-        doc_title = self.extract_title_from_content(content)
         
-        # Split document by headers
-        sections = self.split_by_headers(content)
+        # Split document by headers, picking up the title on the way
+        doc_title, sections = self.split_sections(content)
         
         if not sections:
             # If no sections found, treat entire document as one section
             sections = [(doc_title, content, 1)]
         
-        chunk_id_base = hashlib.md5(file_path.encode()).hexdigest()[:8]
+        chunk_id_base = hashlib.blake2b(file_path.encode(), digest_size=4).hexdigest()
         
+        # (title, content, has_overlap, header_level, token_count) for every chunk;
+        # token_count is None until the chunk is actually tokenized
         all_section_chunks = []
         
-        # Process each section
-        for section_title, section_content, header_level in sections:
-            section_tokens = self.count_tokens(section_content)
-            
-            if section_tokens <= self.max_tokens:
+        # Sections far over the limit are split without tokenizing them whole;
+        # the rest are tokenized in one batch
+        is_large = [self._approx_tokens(section[1]) > self.max_tokens * (1 + APPROX_TOKEN_MARGIN) for section in sections]
+        section_token_counts = iter(self.count_tokens_batch(
+            [section[1] for section, large in zip(sections, is_large) if not large]
+        ))
+        for (section_title, section_content, header_level), large in zip(sections, is_large):
+            section_tokens = None if large else next(section_token_counts)
+            if section_tokens is not None and section_tokens <= self.max_tokens:
                 # Section fits in one chunk
-                all_section_chunks.append((section_title, section_content, False))
+                all_section_chunks.append((section_title, section_content, False, header_level, section_tokens))
             else:
                 # Section needs to be chunked
                 section_chunks = self.chunk_large_section(section_title, section_content)
                 for i, (chunk_title, chunk_content) in enumerate(section_chunks):
                     has_overlap = i > 0  # First chunk has no overlap
-                    all_section_chunks.append((chunk_title, chunk_content, has_overlap))
+                    all_section_chunks.append((chunk_title, chunk_content, has_overlap, header_level, None))
         
         # Create DocumentChunk objects
         total_chunks = len(all_section_chunks)
         
-        for i, (section_title, chunk_content, has_overlap) in enumerate(all_section_chunks):
+        # Chunks far below the minimum are dropped on length alone; every chunk
+        # that is kept gets an exact token count, from one batched call
+        candidate_chunks = [
+            (i, section_chunk) for i, section_chunk in enumerate(all_section_chunks)
+            if total_chunks == 1 or section_chunk[4] is not None
+            or self._approx_tokens(section_chunk[1]) >= self.min_chunk_tokens * (1 - APPROX_TOKEN_MARGIN)
+        ]
+        chunk_token_counts = iter(self.count_tokens_batch(
+            [section_chunk[1] for _, section_chunk in candidate_chunks if section_chunk[4] is None]
+        ))
+        
+        for i, (section_title, chunk_content, has_overlap, header_level, token_count) in candidate_chunks:
+            if token_count is None:
+                token_count = next(chunk_token_counts)
+            
             # Skip chunks that are too small unless they're the only chunk
-            if total_chunks > 1 and self.count_tokens(chunk_content) < self.min_chunk_tokens:
+            if total_chunks > 1 and token_count < self.min_chunk_tokens:
                 continue
             
             chunk_id = f"{chunk_id_base}_{i+1:03d}"
-            token_count = self.count_tokens(chunk_content)
             char_count = len(chunk_content)
             
             # Extract service name from filename
@@ -259,7 +319,7 @@ class AWSDocumentChunker:
             metadata = {
                 'service_name': service_name,
                 'document_type': 'introduction' if 'intro' in file_name else 'guide',
-                'header_level': 1,  # Could be enhanced to track actual header levels
+                'header_level': header_level,
                 'file_size_chars': len(content),
                 'processing_timestamp': None  # Will be set during processing
             }
@@ -282,9 +342,110 @@ class AWSDocumentChunker:
         
         return chunks
     
-    def process_directory(self, input_dir: str, output_dir: str) -> Dict[str, Any]:
+    def process_file(self, md_file: Path, output_path: Path) -> Dict[str, Any]:
+        """
+        Read and chunk one markdown file, save its JSON files, and return its statistics
+        """
+        return self.process_content(md_file, read_text_file(md_file), output_path)
+    
+    def process_content(self, md_file: Path, content: str, output_path: Path) -> Dict[str, Any]:
+        """
+        Chunk the already-read content of one markdown file, save its chunk and
+        summary JSON files, and return its statistics
+        """
+        print(f"Processing: {md_file.name}")
+        
+        # Process document into chunks
+        chunks = self.process_document(str(md_file), content)
+        
+        # Save chunks to individual JSON files
+        file_chunks = []
+        total_tokens = 0
+        total_chars = 0
+        for chunk in chunks:
+            # Add processing timestamp
+            chunk.metadata['processing_timestamp'] = str(pd.Timestamp.now()) if 'pd' in globals() else "2025-08-02"
+            
+            # Save individual chunk file
+            chunk_filename = f"{chunk.chunk_id}.json"
+            chunk_path = output_path / chunk_filename
+            
+            write_json(chunk_path, chunk.to_dict())
+            
+            # The chunk file is the source of truth; the summary only references it
+            file_chunks.append({
+                'chunk_id': chunk.chunk_id,
+                'section': chunk.section,
+                'token_count': chunk.token_count
+            })
+            
+            total_tokens += chunk.token_count
+            total_chars += chunk.char_count
+        
+        # Save file summary
+        file_summary = {
+            'source_file': md_file.name,
+            'total_chunks': len(chunks),
+            'chunks': file_chunks
+        }
+        
+        summary_filename = f"{md_file.stem}_chunks.json"
+        summary_path = output_path / summary_filename
+        
+        write_json(summary_path, file_summary)
+        
+        print(f"  Created {len(chunks)} chunks")
+        
+        return {
+            'filename': md_file.name,
+            'chunks_created': len(chunks),
+            'total_tokens': total_tokens,
+            'total_chars': total_chars
+        }
+    
+    async def process_files_pipelined(self, md_files: List[Path], output_path: Path) -> List[Tuple[Optional[Dict[str, Any]], Optional[str]]]:
+        """
+        Process files in this process with reads overlapped with chunking
+        
+        A producer reads upcoming files in a worker thread while the current one
+        is chunked and written; the small queue keeps at most two files in memory.
+        Returns one (file_stats, error_message) pair per file.
+        """
+        file_queue = asyncio.Queue(maxsize=2)
+        
+        async def produce():
+            for md_file in md_files:
+                try:
+                    content = await asyncio.to_thread(read_text_file, md_file)
+                    await file_queue.put((md_file, content, None))
+                except Exception as e:
+                    await file_queue.put((md_file, None, e))
+            await file_queue.put(None)
+        
+        producer = asyncio.create_task(produce())
+        results = []
+        while (item := await file_queue.get()) is not None:
+            md_file, content, read_error = item
+            try:
+                if read_error:
+                    raise read_error
+                results.append((await asyncio.to_thread(self.process_content, md_file, content, output_path), None))
+            except Exception as e:
+                error_msg = f"Error processing {md_file.name}: {str(e)}"
+                print(f"  ERROR: {error_msg}")
+                results.append((None, error_msg))
+        await producer
+        
+        return results
+    
+    def process_directory(self, input_dir: str, output_dir: str, max_workers: Optional[int] = None) -> Dict[str, Any]:
         """
         Process all markdown files in input directory and save chunks to output directory
+        
+        Files are independent and chunking is CPU-bound, so they are spread across
+        a process pool; each worker writes its own output files. With
+        max_workers=1 files are processed in this process instead, with reads
+        pipelined against chunking.
         """
         input_path = Path(input_dir)
         output_path = Path(output_dir)
@@ -302,73 +463,62 @@ class AWSDocumentChunker:
             'processing_errors': []
         }
         
-        # Process each markdown file
-        for md_file in input_path.glob('*.md'):
-            try:
-                print(f"Processing: {md_file.name}")
-                
-                # Read file content
-                with open(md_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                
-                # Process document into chunks
-                chunks = self.process_document(str(md_file), content)
-                
-                # Save chunks to individual JSON files
-                file_chunks = []
-                for chunk in chunks:
-                    # Add processing timestamp
-                    chunk.metadata['processing_timestamp'] = str(pd.Timestamp.now()) if 'pd' in globals() else "2025-08-02"
-                    
-                    # Save individual chunk file
-                    chunk_filename = f"{chunk.chunk_id}.json"
-                    chunk_path = output_path / chunk_filename
-                    
-                    with open(chunk_path, 'w', encoding='utf-8') as f:
-                        json.dump(asdict(chunk), f, indent=2, ensure_ascii=False)
-                    
-                    file_chunks.append(asdict(chunk))
-                    
-                    # Update statistics
-                    stats['total_tokens'] += chunk.token_count
-                    stats['total_chars'] += chunk.char_count
-                
-                # Save file summary
-                file_summary = {
-                    'source_file': md_file.name,
-                    'total_chunks': len(chunks),
-                    'chunks': file_chunks
-                }
-                
-                summary_filename = f"{md_file.stem}_chunks.json"
-                summary_path = output_path / summary_filename
-                
-                with open(summary_path, 'w', encoding='utf-8') as f:
-                    json.dump(file_summary, f, indent=2, ensure_ascii=False)
-                
-                # Update statistics
-                stats['total_files'] += 1
-                stats['total_chunks'] += len(chunks)
-                stats['files_processed'].append({
-                    'filename': md_file.name,
-                    'chunks_created': len(chunks),
-                    'total_tokens': sum(chunk.token_count for chunk in chunks)
-                })
-                
-                print(f"  Created {len(chunks)} chunks")
-                
-            except Exception as e:
-                error_msg = f"Error processing {md_file.name}: {str(e)}"
-                print(f"  ERROR: {error_msg}")
+        md_files = [Path(entry.path) for entry in os.scandir(input_path)
+                    if entry.name.endswith('.md') and entry.is_file()]
+        
+        if max_workers == 1:
+            file_results = asyncio.run(self.process_files_pipelined(md_files, output_path))
+        else:
+            # Process each markdown file in a worker process
+            worker_args = [
+                (str(md_file), str(output_path), self.max_tokens, self.overlap_tokens, self.min_chunk_tokens)
+                for md_file in md_files
+            ]
+            with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count()) as executor:
+                file_results = list(executor.map(_process_one_file, worker_args, chunksize=4))
+        
+        for file_stats, error_msg in file_results:
+            if error_msg:
                 stats['processing_errors'].append(error_msg)
+                continue
+            
+            # Update statistics
+            stats['total_files'] += 1
+            stats['total_chunks'] += file_stats['chunks_created']
+            stats['total_tokens'] += file_stats['total_tokens']
+            stats['total_chars'] += file_stats['total_chars']
+            stats['files_processed'].append({
+                'filename': file_stats['filename'],
+                'chunks_created': file_stats['chunks_created'],
+                'total_tokens': file_stats['total_tokens']
+            })
         
         # Save overall statistics
         stats_path = output_path / 'processing_stats.json'
-        with open(stats_path, 'w', encoding='utf-8') as f:
-            json.dump(stats, f, indent=2, ensure_ascii=False)
+        write_json(stats_path, stats)
         
         return stats
 
+def _process_one_file(args: Tuple[str, str, int, int, int]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Process-pool worker: chunk one file and return (file_stats, error_message)
+    
+    The tokenizer does not pickle, so each call builds its own chunker.
+    """
+    file_path, output_dir, max_tokens, overlap_tokens, min_chunk_tokens = args
+    md_file = Path(file_path)
+    try:
+        chunker = AWSDocumentChunker(
+            max_tokens=max_tokens,
+            overlap_tokens=overlap_tokens,
+            min_chunk_tokens=min_chunk_tokens
+        )
+        return chunker.process_file(md_file, Path(output_dir)), None
+    except Exception as e:
+        error_msg = f"Error processing {md_file.name}: {str(e)}"
+        print(f"  ERROR: {error_msg}")
+        return None, error_msg
+
 def main():
     """Main function to run the preprocessing"""
     
@@ -17,11 +17,14 @@ Usage:
     python query_aws_docs_s3_vectors.py --query "How do I scale Lambda functions?"
 """
 
-import json
+import orjson
 import boto3
+from botocore.config import Config
 import argparse
+import functools
 import numpy as np
-from typing import List, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
 import logging
 
 # Configure logging
@@ -29,62 +32,89 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AWSDocsVectorSearch:
-    def __init__(self, vector_bucket_name: str, index_name: str, region_name: str = "us-east-1"):
+    def __init__(self, vector_bucket_name: str, index_name: str, region_name: str = "us-east-1",
+                 embedding_cache_size: int = 512):
         """Initialize the AWS Documentation Vector Search."""
         self.vector_bucket_name = vector_bucket_name
         self.index_name = index_name
         self.region_name = region_name
         
-        # Initialize clients
-        self.s3vectors_client = boto3.client('s3vectors', region_name=region_name)
-        self.bedrock_client = boto3.client('bedrock-runtime', region_name="us-west-2")  # Titan model region
+        # Initialize clients from one session with pooled keep-alive connections,
+        # so interactive mode reuses TLS connections across queries
+        session = boto3.Session(region_name=region_name)
+        client_config = Config(
+            max_pool_connections=50,
+            tcp_keepalive=True,
+            retries={'max_attempts': 3, 'mode': 'adaptive'}
+        )
+        self.s3vectors_client = session.client('s3vectors', config=client_config)
+        self.bedrock_client = session.client('bedrock-runtime', region_name="us-west-2", config=client_config)  # Titan model region
+        
+        # Repeated queries (e.g. in interactive mode) skip the Bedrock round trip
+        self._cached_query_embedding = functools.lru_cache(maxsize=embedding_cache_size)(self.fetch_query_embedding)
         
         logger.info(f"Initialized AWS Docs Vector Search for bucket: {vector_bucket_name}, index: {index_name}")
 
-    def generate_query_embedding(self, query_text: str) -> List[float]:
+    def fetch_query_embedding(self, query_text: str, dimensions: int = 1024, normalize: bool = True) -> np.ndarray:
+        """Call Titan Text Embeddings V2 and return the embedding as a read-only float32 array."""
+        # Prepare request body
+        body = orjson.dumps({
+            "inputText": query_text,
+            "dimensions": dimensions,
+            "normalize": normalize,
+            "embeddingTypes": ["float"]
+        })
+        
+        # Call Bedrock
+        response = self.bedrock_client.invoke_model(
+            body=body,
+            modelId="amazon.titan-embed-text-v2:0",
+            accept="application/json",
+            contentType="application/json"
+        )
+        
+        # Parse response
+        response_body = orjson.loads(response["body"].read())
+        
+        logger.info(f"Generated embedding for query: '{query_text[:50]}...'")
+        # Convert to float32 once; the array is shared through the LRU cache, so freeze it
+        embedding = np.asarray(response_body["embedding"], dtype=np.float32)
+        embedding.flags.writeable = False
+        return embedding
+
+    def generate_query_embedding(self, query_text: str) -> Optional[np.ndarray]:
         """Generate embedding for query text using Titan Text Embeddings V2."""
         try:
-            # Prepare request body
-            body = json.dumps({
-                "inputText": query_text,
-                "dimensions": 1024,
-                "normalize": True,
-                "embeddingTypes": ["float"]
-            })
-            
-            # Call Bedrock
-            response = self.bedrock_client.invoke_model(
-                body=body,
-                modelId="amazon.titan-embed-text-v2:0",
-                accept="application/json",
-                contentType="application/json"
-            )
-            
-            # Parse response
-            response_body = json.loads(response["body"].read())
-            embedding = response_body["embedding"]
-            
-            logger.info(f"Generated embedding for query: '{query_text[:50]}...'")
-            return embedding
+            return self._cached_query_embedding(query_text, 1024, True)
             
         except Exception as e:
             logger.error(f"Error generating query embedding: {str(e)}")
             return None
 
-    def search_vectors(self, query_text: str, top_k: int = 5, service_filter: str = None) -> List[Dict[str, Any]]:
-        """Search for similar vectors in the S3 Vectors index."""
+    def search_vectors(self, query_text: str, top_k: int = 5, service_filter: str = None,
+                       rerank: bool = False, rerank_candidates: int = 30) -> List[Dict[str, Any]]:
+        """Search for similar vectors in the S3 Vectors index.
+        
+        With rerank=True, rerank_candidates results are fetched and the best top_k
+        are chosen locally by exact cosine similarity against their stored vectors.
+        """
+        # Generate query embedding
+        query_embedding = self.generate_query_embedding(query_text)
+        if query_embedding is None:
+            return []
+        
+        return self.search_by_embedding(query_embedding, top_k, service_filter, rerank, rerank_candidates)
+
+    def search_by_embedding(self, query_embedding: np.ndarray, top_k: int = 5, service_filter: str = None,
+                            rerank: bool = False, rerank_candidates: int = 30) -> List[Dict[str, Any]]:
+        """Query the S3 Vectors index with an already generated embedding."""
         try:
-            # Generate query embedding
-            query_embedding = self.generate_query_embedding(query_text)
-            if not query_embedding:
-                return []
-            
             # Prepare query parameters
             query_params = {
                 'vectorBucketName': self.vector_bucket_name,
                 'indexName': self.index_name,
-                'queryVector': {'float32': query_embedding},
-                'topK': top_k,
+                'queryVector': {'float32': query_embedding.tolist()},
+                'topK': max(top_k, rerank_candidates) if rerank else top_k,
                 'returnDistance': True,
                 'returnMetadata': True
             }
@@ -95,14 +125,60 @@ class AWSDocsVectorSearch:
             
             # Execute query
             response = self.s3vectors_client.query_vectors(**query_params)
+            vectors = response.get('vectors', [])
+            
+            if rerank and vectors:
+                vectors = self.rerank_vectors(query_embedding, vectors, top_k)
             
-            logger.info(f"Found {len(response.get('vectors', []))} similar documents")
-            return response.get('vectors', [])
+            logger.info(f"Found {len(vectors)} similar documents")
+            return vectors
             
         except Exception as e:
             logger.error(f"Error searching vectors: {str(e)}")
             return []
 
+    def search_many(self, queries: List[str], top_k: int = 5, service_filter: str = None,
+                    rerank: bool = False) -> List[List[Dict[str, Any]]]:
+        """Search several queries at once, overlapping their network calls.
+        
+        All embeddings are requested concurrently, then all index queries; wall time
+        is roughly that of the slowest query rather than the sum. Results are
+        returned in the same order as the queries.
+        """
+        if not queries:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(16, len(queries))) as executor:
+            embeddings = list(executor.map(self.generate_query_embedding, queries))
+            return list(executor.map(
+                lambda query_embedding: self.search_by_embedding(query_embedding, top_k, service_filter, rerank)
+                if query_embedding is not None else [],
+                embeddings
+            ))
+
+    def rerank_vectors(self, query_embedding: np.ndarray, vectors: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+        """Order query results by exact cosine similarity, computed with one matrix-vector product."""
+        # QueryVectors does not return vector data, so fetch it for the candidate keys
+        response = self.s3vectors_client.get_vectors(
+            vectorBucketName=self.vector_bucket_name,
+            indexName=self.index_name,
+            keys=[vector['key'] for vector in vectors],
+            returnData=True,
+            returnMetadata=False
+        )
+        data_by_key = {vector['key']: vector['data']['float32'] for vector in response.get('vectors', [])}
+        vectors = [vector for vector in vectors if vector['key'] in data_by_key]
+        if not vectors:
+            return []
+        
+        # Titan embeddings are normalized, so the dot product is the cosine similarity
+        candidate_matrix = np.asarray([data_by_key[vector['key']] for vector in vectors], dtype=np.float32)
+        similarities = candidate_matrix @ query_embedding
+        order = np.argsort(-similarities)[:top_k]
+        
+        # Keep 'distance' consistent with the reranked similarity for display
+        return [dict(vectors[i], distance=float(1 - similarities[i])) for i in order]
+
     def format_search_results(self, results: List[Dict[str, Any]], query: str) -> str:
         """Format search results for display."""
         if not results:
@@ -218,9 +294,11 @@ def main():
     """Main execution function."""
     parser = argparse.ArgumentParser(description="Search AWS Documentation using S3 Vectors")
     parser.add_argument("--query", "-q", help="Search query")
+    parser.add_argument("--queries-file", help="File with one search query per line, searched concurrently")
     parser.add_argument("--service", "-s", help="Filter by AWS service")
     parser.add_argument("--top-k", "-k", type=int, default=5, help="Number of results to return")
     parser.add_argument("--interactive", "-i", action="store_true", help="Interactive mode")
+    parser.add_argument("--rerank", action="store_true", help="Rerank a wider candidate set locally by exact similarity")
     
     args = parser.parse_args()
     
@@ -235,13 +313,24 @@ def main():
         region_name="us-east-1"
     )
     
-    if args.query:
+    if args.queries_file:
+        # Batch mode
+        with open(args.queries_file, 'r', encoding='utf-8') as f:
+            queries = [line.strip() for line in f if line.strip()]
+        
+        print(f"🔍 Searching for {len(queries)} queries")
+        all_results = search.search_many(queries, top_k=args.top_k, service_filter=args.service, rerank=args.rerank)
+        for query, results in zip(queries, all_results):
+            print(search.format_search_results(results, query))
+            print()
+        
+    elif args.query:
         # Single query mode
         print(f"🔍 Searching for: '{args.query}'")
         if args.service:
             print(f"🎯 Filtering by service: {args.service}")
         
-        results = search.search_vectors(args.query, top_k=args.top_k, service_filter=args.service)
+        results = search.search_vectors(args.query, top_k=args.top_k, service_filter=args.service, rerank=args.rerank)
         formatted_results = search.format_search_results(results, args.query)
         print(formatted_results)
         
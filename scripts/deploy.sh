@@ -108,7 +108,8 @@ cat > /tmp/lambda-rag-policy.json << EOF
     {
       "Effect": "Allow",
       "Action": [
-        "bedrock:InvokeModel"
+        "bedrock:InvokeModel",
+        "bedrock:InvokeModelWithResponseStream"
       ],
       "Resource": [
         "arn:aws:bedrock:*::foundation-model/anthropic.claude-3-5-sonnet-20240620-v1:0",
@@ -119,7 +120,8 @@ cat > /tmp/lambda-rag-policy.json << EOF
       "Effect": "Allow",
       "Action": [
         "s3vectors:QueryVectors",
-        "s3vectors:GetVectors"
+        "s3vectors:GetVectors",
+        "s3vectors:ListIndexes"
       ],
       "Resource": "*"
     }
@@ -166,8 +168,13 @@ cd /tmp/lambda-deployment
 cp ../backend/lambda_rag_handler.py .
 cp ../backend/aws_docs_rag_system.py .
 
-# Install dependencies
-pip3 install boto3 -t .
+# Install dependencies (manylinux wheels matching the python3.11 x86_64 runtime;
+# orjson and numpy are not part of the managed runtime)
+pip3 install boto3 orjson numpy -t . \
+  --platform manylinux2014_x86_64 \
+  --implementation cp \
+  --python-version 3.11 \
+  --only-binary=:all:
 
 # Create deployment package
 zip -r lambda-rag-function.zip .
@@ -188,7 +195,7 @@ aws lambda create-function \
   --zip-file fileb://lambda-rag-function.zip \
   --timeout 60 \
   --memory-size 1024 \
-  --environment Variables="{VECTOR_BUCKET_NAME=$VECTOR_BUCKET_NAME,INDEX_NAME=$INDEX_NAME,BEDROCK_REGION=$REGION,S3VECTORS_REGION=$REGION}" \
+  --environment Variables="{VECTOR_BUCKET_NAME=$VECTOR_BUCKET_NAME,INDEX_NAME=$INDEX_NAME,BEDROCK_REGION=$REGION,S3VECTORS_REGION=$REGION,PREWARM_RAG_SYSTEM=true}" \
   --region $REGION
 
 echo -e "${GREEN}✅ Lambda function deployed successfully${NC}"